@@ -1,4 +1,4 @@
-from django.db.models import Count, Avg, Sum, F
+from django.db.models import Count, Avg, Sum, Q, FloatField, ExpressionWrapper
 from django.db.models.functions import TruncDate
 from django.utils import timezone
 from datetime import timedelta
@@ -9,6 +9,13 @@ from rest_framework.permissions import AllowAny
 from promptengine.models import PromptExecution, PromptTemplate
 
 
+def _cost_sum():
+    """Total cost in dollars, summed over the integer micro-dollar column."""
+    return ExpressionWrapper(
+        Sum('cost_micros') / float(PromptExecution.MICROS_PER_DOLLAR), output_field=FloatField()
+    )
+
+
 @api_view(['GET'])
 def dashboard_stats(request):
     """Main dashboard statistics."""
@@ -16,13 +23,12 @@ def dashboard_stats(request):
     last_30d = now - timedelta(days=30)
     last_7d = now - timedelta(days=7)
 
-    total_executions = PromptExecution.objects.count()
-    recent_executions = PromptExecution.objects.filter(created_at__gte=last_7d).count()
-
     agg = PromptExecution.objects.aggregate(
+        total_executions=Count('id'),
+        recent_executions=Count('id', filter=Q(created_at__gte=last_7d)),
         total_tokens_in=Sum('tokens_input'),
         total_tokens_out=Sum('tokens_output'),
-        total_cost=Sum('cost_estimate'),
+        total_cost=_cost_sum(),
         avg_latency=Avg('latency_ms'),
         avg_rating=Avg('rating'),
     )
@@ -37,13 +43,13 @@ def dashboard_stats(request):
         PromptExecution.objects.filter(created_at__gte=last_30d)
         .annotate(date=TruncDate('created_at'))
         .values('date')
-        .annotate(count=Count('id'), cost=Sum('cost_estimate'))
+        .annotate(count=Count('id'), cost=_cost_sum())
         .order_by('date')
     )
 
     model_usage = list(
         PromptExecution.objects.values('model_used')
-        .annotate(count=Count('id'), total_cost=Sum('cost_estimate'))
+        .annotate(count=Count('id'), total_cost=_cost_sum())
         .order_by('-count')
     )
 
@@ -54,11 +60,11 @@ def dashboard_stats(request):
     )
 
     return Response({
-        'total_executions': total_executions,
-        'recent_executions_7d': recent_executions,
+        'total_executions': agg['total_executions'],
+        'recent_executions_7d': agg['recent_executions'],
         'total_tokens_input': agg['total_tokens_in'] or 0,
         'total_tokens_output': agg['total_tokens_out'] or 0,
-        'total_cost': float(agg['total_cost'] or 0),
+        'total_cost': agg['total_cost'] or 0,
         'avg_latency_ms': round(agg['avg_latency'] or 0, 1),
         'avg_rating': round(agg['avg_rating'] or 0, 2),
         'category_breakdown': category_breakdown,
@@ -79,7 +85,7 @@ def cost_analysis(request):
         .annotate(date=TruncDate('created_at'))
         .values('date')
         .annotate(
-            cost=Sum('cost_estimate'),
+            cost=_cost_sum(),
             tokens_in=Sum('tokens_input'),
             tokens_out=Sum('tokens_output'),
             count=Count('id'),
@@ -90,14 +96,14 @@ def cost_analysis(request):
     by_model = list(
         PromptExecution.objects.filter(created_at__gte=since)
         .values('model_used')
-        .annotate(cost=Sum('cost_estimate'), count=Count('id'))
+        .annotate(cost=_cost_sum(), count=Count('id'))
         .order_by('-cost')
     )
 
     by_category = list(
         PromptExecution.objects.filter(created_at__gte=since)
         .values('category')
-        .annotate(cost=Sum('cost_estimate'), count=Count('id'))
+        .annotate(cost=_cost_sum(), count=Count('id'))
         .order_by('-cost')
     )
 
@@ -127,7 +133,7 @@ def performance_metrics(request):
 
     success_rate = PromptExecution.objects.filter(created_at__gte=since).aggregate(
         total=Count('id'),
-        completed=Count('id', filter=F('status') == 'completed') if False else Count('id'),
+        completed=Count('id', filter=Q(status=PromptExecution.Status.COMPLETED)),
     )
 
     rating_dist = list(
@@ -1,7 +1,7 @@
 import json
 import uuid
 from django.utils import timezone
-from promptengine.services import execute_prompt, _sanitize_json
+from promptengine.services import Usage, execute_prompt, execute_prompt_batch, _json_pretty, _sanitize_json
 
 
 # --- Tutorial Seed Data ---
@@ -489,13 +489,16 @@ def run_test_suite(suite, model=None, prompt_text=None, system_prompt=None):
 def run_batch_evaluation(prompt_text, system_prompt, inputs, model='gpt-4o-mini'):
     """Run a prompt against multiple inputs in batch."""
     results = []
-    total_tokens = 0
-    total_cost = 0.0
-    total_latency = 0
 
-    for i, inp in enumerate(inputs):
-        user_input = prompt_text + "\n\nInput: " + inp if inp else prompt_text
-        result = execute_prompt(system_prompt, user_input, model, temperature=0.2, max_tokens=2048)
+    batch = execute_prompt_batch([
+        {
+            'system_prompt': system_prompt,
+            'user_prompt': prompt_text + "\n\nInput: " + inp if inp else prompt_text,
+            'model': model, 'temperature': 0.2, 'max_tokens': 2048,
+        }
+        for inp in inputs
+    ])
+    for i, (inp, result) in enumerate(zip(inputs, batch)):
         tokens = result.get('tokens_input', 0) + result.get('tokens_output', 0)
         results.append({
             'index': i + 1,
@@ -504,40 +507,33 @@ def run_batch_evaluation(prompt_text, system_prompt, inputs, model='gpt-4o-mini'
             'tokens': tokens,
             'latency_ms': result.get('latency_ms', 0),
         })
-        total_tokens += tokens
-        total_cost += result.get('cost_estimate', 0)
-        total_latency += result.get('latency_ms', 0)
 
-    return {
-        'output': json.dumps({
-            'results': results,
-            'summary': {
-                'total_inputs': len(inputs),
-                'total_tokens': total_tokens,
-                'total_cost': total_cost,
-                'total_latency_ms': total_latency,
-                'avg_latency_ms': total_latency // max(len(inputs), 1),
-            }
-        }, indent=2),
-        'tokens_input': total_tokens,
-        'tokens_output': 0,
-        'cost_estimate': total_cost,
-        'latency_ms': total_latency,
-        'model': model,
-    }
+    # The inputs ran concurrently, so the batch took as long as its slowest call
+    usage = Usage()
+    usage.add_concurrent(batch)
+    return usage.as_result(_json_pretty({
+        'results': results,
+        'summary': {
+            'total_inputs': len(inputs),
+            'total_tokens': usage.tokens_input + usage.tokens_output,
+            'total_cost': usage.cost_estimate,
+            'total_latency_ms': usage.latency_ms,
+            'avg_latency_ms': sum(r['latency_ms'] for r in results) // max(len(inputs), 1),
+        }
+    }), model)
 
 
 def run_consistency_check(prompt_text, system_prompt, input_text, num_runs=5, model='gpt-4o-mini'):
     """Run the same prompt N times and analyze output variance."""
     outputs = []
-    total_tokens = 0
-    total_cost = 0.0
-    total_latency = 0
 
     user_input = prompt_text + "\n\nInput: " + input_text if input_text else prompt_text
 
-    for i in range(num_runs):
-        result = execute_prompt(system_prompt, user_input, model, temperature=0.7, max_tokens=2048)
+    runs = execute_prompt_batch([
+        {'system_prompt': system_prompt, 'user_prompt': user_input, 'model': model,
+         'temperature': 0.7, 'max_tokens': 2048}
+    ] * num_runs)
+    for i, result in enumerate(runs):
         tokens = result.get('tokens_input', 0) + result.get('tokens_output', 0)
         outputs.append({
             'run': i + 1,
@@ -545,9 +541,6 @@ def run_consistency_check(prompt_text, system_prompt, input_text, num_runs=5, mo
             'tokens': tokens,
             'latency_ms': result.get('latency_ms', 0),
         })
-        total_tokens += tokens
-        total_cost += result.get('cost_estimate', 0)
-        total_latency += result.get('latency_ms', 0)
 
     # Analyze consistency
     analysis_system = (
@@ -557,22 +550,16 @@ def run_consistency_check(prompt_text, system_prompt, input_text, num_runs=5, mo
     )
     outputs_text = "\n\n".join(f"--- Run {o['run']} ---\n{o['output']}" for o in outputs)
     analysis = execute_prompt(analysis_system, outputs_text, model, temperature=0.1, max_tokens=1024)
-    total_tokens += analysis.get('tokens_input', 0) + analysis.get('tokens_output', 0)
-    total_cost += analysis.get('cost_estimate', 0)
-    total_latency += analysis.get('latency_ms', 0)
 
-    return {
-        'output': json.dumps({
-            'runs': outputs,
-            'analysis': analysis.get('output', ''),
-            'num_runs': num_runs,
-        }, indent=2),
-        'tokens_input': total_tokens,
-        'tokens_output': 0,
-        'cost_estimate': total_cost,
-        'latency_ms': total_latency,
-        'model': model,
-    }
+    # The runs went out concurrently; the analysis follows them
+    usage = Usage()
+    usage.add_concurrent(runs)
+    usage.add(analysis)
+    return usage.as_result(_json_pretty({
+        'runs': outputs,
+        'analysis': analysis.get('output', ''),
+        'num_runs': num_runs,
+    }), model)
 
 
 def optimize_cost(prompt_text, system_prompt, model='gpt-4o-mini'):
@@ -598,14 +585,15 @@ def optimize_cost(prompt_text, system_prompt, model='gpt-4o-mini'):
 def compare_models(prompt_text, system_prompt, input_text, models):
     """Run the same prompt on multiple models and compare."""
     results = []
-    total_tokens = 0
-    total_cost = 0.0
-    total_latency = 0
 
     user_input = prompt_text + "\n\nInput: " + input_text if input_text else prompt_text
 
-    for mdl in models:
-        result = execute_prompt(system_prompt, user_input, mdl, temperature=0.3, max_tokens=2048)
+    batch = execute_prompt_batch([
+        {'system_prompt': system_prompt, 'user_prompt': user_input, 'model': mdl,
+         'temperature': 0.3, 'max_tokens': 2048}
+        for mdl in models
+    ])
+    for mdl, result in zip(models, batch):
         tokens = result.get('tokens_input', 0) + result.get('tokens_output', 0)
         results.append({
             'model': mdl,
@@ -614,18 +602,11 @@ def compare_models(prompt_text, system_prompt, input_text, models):
             'cost': float(result.get('cost_estimate', 0)),
             'latency_ms': result.get('latency_ms', 0),
         })
-        total_tokens += tokens
-        total_cost += result.get('cost_estimate', 0)
-        total_latency += result.get('latency_ms', 0)
 
-    return {
-        'output': json.dumps({'model_results': results}, indent=2),
-        'tokens_input': total_tokens,
-        'tokens_output': 0,
-        'cost_estimate': total_cost,
-        'latency_ms': total_latency,
-        'model': ','.join(models),
-    }
+    # All models were queried concurrently
+    usage = Usage()
+    usage.add_concurrent(batch)
+    return usage.as_result(_json_pretty({'model_results': results}), ','.join(models))
 
 
 def generate_snippet(system_prompt, user_prompt_template, model, language):
@@ -686,6 +667,8 @@ def generate_snippet(system_prompt, user_prompt_template, model, language):
 
 def global_search(query, scope='all'):
     """Search across executions, templates, and shared prompts."""
+    from django.db import models
+    from django.db.models.functions import Left
     from promptengine.models import PromptExecution, PromptTemplate
     from .models import SharedPrompt, PromptProject
 
@@ -697,9 +680,9 @@ def global_search(query, scope='all'):
             models.Q(output_data__icontains=q) |
             models.Q(input_data__icontains=q) |
             models.Q(category__icontains=q)
-        )[:10]
+        ).annotate(preview=Left('output_data', 150)).values('id', 'category', 'preview', 'created_at')[:10]
         results['executions'] = [
-            {'id': str(e.id), 'category': e.category, 'preview': e.output_data[:150], 'created_at': str(e.created_at)}
+            {'id': str(e['id']), 'category': e['category'], 'preview': e['preview'], 'created_at': str(e['created_at'])}
             for e in execs
         ]
 
@@ -1,6 +1,7 @@
 import json
 import uuid
 
+import orjson
 from django.contrib.auth.models import User
 from django.db import models
 from rest_framework import viewsets, status
@@ -308,7 +309,7 @@ def submit_challenge(request):
     try:
         parsed = json.loads(services._sanitize_json(feedback))
         score = parsed.get('score', 0)
-        feedback = json.dumps(parsed)
+        feedback = orjson.dumps(parsed).decode()
     except (json.JSONDecodeError, TypeError):
         pass
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PromptTemplate, PromptExecution, PromptVersion, PromptChain, SavedOutput
+from .models import PromptTemplate, PromptExecution, PromptVersion, PromptChain, SavedOutput, BatchJob
 
 
 @admin.register(PromptTemplate)
@@ -11,7 +11,7 @@ class PromptTemplateAdmin(admin.ModelAdmin):
 
 @admin.register(PromptExecution)
 class PromptExecutionAdmin(admin.ModelAdmin):
-    list_display = ['id', 'category', 'status', 'model_used', 'tokens_input', 'tokens_output', 'cost_estimate', 'latency_ms', 'rating', 'created_at']
+    list_display = ['id', 'category', 'status', 'model_used', 'tokens_input', 'tokens_output', 'cost_dollars', 'latency_ms', 'rating', 'created_at']
     list_filter = ['category', 'status', 'model_used']
     readonly_fields = ['id', 'created_at']
 
@@ -30,3 +30,10 @@ class PromptChainAdmin(admin.ModelAdmin):
 @admin.register(SavedOutput)
 class SavedOutputAdmin(admin.ModelAdmin):
     list_display = ['title', 'user', 'is_favorite', 'shared', 'created_at']
+
+
+@admin.register(BatchJob)
+class BatchJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'provider', 'category', 'status', 'provider_batch_id', 'created_at', 'completed_at']
+    list_filter = ['provider', 'category', 'status']
+    readonly_fields = ['id', 'created_at']
@@ -0,0 +1,36 @@
+import sys
+import logging
+import threading
+
+from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _prewarm():
+    """Import the LLM stack and open the provider connection ahead of the first request."""
+    try:
+        from . import services
+        # Loads (and on first run downloads) the BPE ranks used for token counts
+        services._encoding_for('gpt-4o-mini')
+        if settings.ANTHROPIC_API_KEY:
+            services.get_llm('claude-3-5-sonnet-20241022')
+        if settings.OPENAI_API_KEY:
+            services.get_llm()
+            services._HTTP_CLIENT.head('https://api.openai.com/v1/models')
+    except Exception as e:
+        logger.debug("LLM prewarm skipped: %s", e)
+
+
+class PromptEngineConfig(AppConfig):
+    name = 'promptengine'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # LLM_PREWARM is only set for the web server, whose container also runs
+        # management commands (migrate, seed_templates) that should not start it
+        management = sys.argv[0].endswith('manage.py') and sys.argv[1:2] != ['runserver']
+        if settings.LLM_PREWARM and not management:
+            threading.Thread(target=_prewarm, name='llm-prewarm', daemon=True).start()
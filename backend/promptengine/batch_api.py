@@ -0,0 +1,206 @@
+"""
+Provider batch endpoints (OpenAI Batch API, Anthropic Message Batches).
+
+Bulk jobs that can wait up to 24h for results are billed at half the real-time
+token price. Items are execute_prompt keyword dicts; results come back in the
+same dict shape as execute_prompt, in item order.
+"""
+import functools
+import logging
+
+import orjson
+from django.conf import settings
+from django.utils import timezone
+
+from . import services
+from .models import BatchJob
+
+logger = logging.getLogger(__name__)
+
+BATCH_PRICE_FACTOR = 0.5
+
+# Features that can be submitted as batch jobs: input text + model -> execute_prompt kwargs.
+# Only single-call features fit; multi-stage pipelines need each stage's output first.
+BATCH_FEATURES = {
+    'feedback_analysis': lambda text, model: services._feedback_call(text, model, 0.0),
+    'quiz_generator': lambda text, model: services._quiz_call(text, model=model),
+    'prompt_grader': lambda text, model: services._grade_call(text, '', '', model),
+    'injection_tester': lambda text, model: services._injection_call(text, model),
+    'cot_visualizer': lambda text, model: services._cot_call(text, model),
+    'tree_of_thoughts': lambda text, model: services._tree_of_thoughts_call(text, model=model),
+    'ape_studio': lambda text, model: services._ape_call(text, model=model),
+    'prompt_evolution': lambda text, model: services._evolution_call(text, model=model),
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _openai_client():
+    import openai
+    return openai.OpenAI(api_key=settings.OPENAI_API_KEY, http_client=services._HTTP_CLIENT)
+
+
+@functools.lru_cache(maxsize=1)
+def _anthropic_client():
+    import anthropic
+    return anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+
+
+def _custom_id(index):
+    return f"item-{index}"
+
+
+def _item_result(item, output='', tokens_in=0, tokens_out=0, error=None):
+    result = {
+        'output': output,
+        'tokens_input': tokens_in,
+        'tokens_output': tokens_out,
+        'cost_estimate': round(services._estimate_cost(item['model'], tokens_in, tokens_out) * BATCH_PRICE_FACTOR, 6),
+        'latency_ms': 0,
+        'model': item['model'],
+    }
+    if error:
+        result['error'] = error
+    return result
+
+
+def submit_openai_batch(items):
+    """Upload items as a JSONL batch file and start a chat-completions batch; returns the batch id."""
+    lines = []
+    for index, item in enumerate(items):
+        messages = []
+        if item.get('system_prompt'):
+            messages.append({'role': 'system', 'content': item['system_prompt']})
+        messages.append({'role': 'user', 'content': item['user_prompt']})
+        lines.append(orjson.dumps({
+            'custom_id': _custom_id(index),
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {
+                'model': item['model'],
+                'messages': messages,
+                'temperature': item.get('temperature', 0.0),
+                'max_tokens': item.get('max_tokens', 1024),
+            },
+        }))
+    client = _openai_client()
+    batch_file = client.files.create(file=('batch.jsonl', b'\n'.join(lines)), purpose='batch')
+    batch = client.batches.create(
+        input_file_id=batch_file.id, endpoint='/v1/chat/completions', completion_window='24h',
+    )
+    return batch.id
+
+
+def submit_anthropic_batch(items):
+    """Start an Anthropic Message Batch for the items; returns the batch id."""
+    requests = []
+    for index, item in enumerate(items):
+        params = {
+            'model': item['model'],
+            'max_tokens': item.get('max_tokens', 1024),
+            'temperature': item.get('temperature', 0.0),
+            'messages': [{'role': 'user', 'content': item['user_prompt']}],
+        }
+        if item.get('system_prompt'):
+            params['system'] = [
+                {'type': 'text', 'text': item['system_prompt'], 'cache_control': {'type': 'ephemeral'}},
+            ]
+        requests.append({'custom_id': _custom_id(index), 'params': params})
+    return _anthropic_client().messages.batches.create(requests=requests).id
+
+
+def submit_batch_job(items, category=''):
+    """Submit items to their provider's batch endpoint and record the job."""
+    provider = services._llm_provider(items[0]['model'])
+    if any(services._llm_provider(item['model']) != provider for item in items):
+        raise ValueError("All items in a batch job must use the same provider")
+    if provider == BatchJob.Provider.ANTHROPIC:
+        batch_id = submit_anthropic_batch(items)
+    else:
+        batch_id = submit_openai_batch(items)
+    return BatchJob.objects.create(provider=provider, provider_batch_id=batch_id, category=category, items=items)
+
+
+def submit_feature_batch(feature, inputs, model='gpt-4o-mini'):
+    """Submit one batch request per input text for a batch-capable feature."""
+    build = BATCH_FEATURES[feature]
+    return submit_batch_job([build(text, model) for text in inputs], category=feature)
+
+
+def _collect_openai(job):
+    """Results for a finished OpenAI batch, or None while it is still running."""
+    client = _openai_client()
+    batch = client.batches.retrieve(job.provider_batch_id)
+    if batch.status in ('failed', 'expired', 'cancelled'):
+        raise RuntimeError(f"OpenAI batch {batch.status}")
+    if batch.status != 'completed':
+        return None
+
+    by_id = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if line.strip():
+                row = orjson.loads(line)
+                by_id[row['custom_id']] = row
+
+    results = []
+    for index, item in enumerate(job.items):
+        row = by_id.get(_custom_id(index))
+        response = (row or {}).get('response') or {}
+        body = response.get('body') or {}
+        if response.get('status_code') == 200:
+            usage = body.get('usage') or {}
+            results.append(_item_result(
+                item, body['choices'][0]['message']['content'],
+                usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0),
+            ))
+        else:
+            error = (row or {}).get('error') or body.get('error') or 'No result returned'
+            results.append(_item_result(item, error=str(error)))
+    return results
+
+
+def _collect_anthropic(job):
+    """Results for a finished Anthropic batch, or None while it is still running."""
+    client = _anthropic_client()
+    batch = client.messages.batches.retrieve(job.provider_batch_id)
+    if batch.processing_status != 'ended':
+        return None
+
+    by_id = {entry.custom_id: entry.result for entry in client.messages.batches.results(job.provider_batch_id)}
+    results = []
+    for index, item in enumerate(job.items):
+        result = by_id.get(_custom_id(index))
+        if result is not None and result.type == 'succeeded':
+            message = result.message
+            results.append(_item_result(
+                item, ''.join(block.text for block in message.content if block.type == 'text'),
+                message.usage.input_tokens, message.usage.output_tokens,
+            ))
+        else:
+            results.append(_item_result(item, error=result.type if result is not None else 'No result returned'))
+    return results
+
+
+def poll_batch_job(job):
+    """Refresh a submitted job from its provider, storing results once it has finished."""
+    if job.status != BatchJob.Status.SUBMITTED:
+        return job
+    try:
+        if job.provider == BatchJob.Provider.ANTHROPIC:
+            results = _collect_anthropic(job)
+        else:
+            results = _collect_openai(job)
+    except RuntimeError as e:
+        job.status = BatchJob.Status.FAILED
+        job.error_message = str(e)
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'completed_at'])
+        return job
+    if results is not None:
+        job.results = results
+        job.status = BatchJob.Status.COMPLETED
+        job.completed_at = timezone.now()
+        job.save(update_fields=['results', 'status', 'completed_at'])
+    return job
@@ -0,0 +1,104 @@
+"""
+Response cache for deterministic prompt executions.
+
+Only exact matches are served. The key is a SHA-256 over model, system
+prompt, generation settings and the complete user prompt, so any change to
+the input, or to the parameters rendered into it (question counts, difficulty
+mix, a new transcript), is a different entry. Entries are kept in a
+per-process LRU and, when enabled, in the shared Django cache so other
+workers and restarts benefit.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(*parts):
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU of responses keyed by the exact request, backed by the shared cache."""
+
+    def __init__(self, max_entries=1024, shared_ttl=0):
+        self.max_entries = max_entries
+        self.shared_ttl = shared_ttl       # seconds in the shared Django cache; 0 disables it
+        self.stats = {'hits': 0, 'shared_hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> response
+
+    def lookup(self, model, system_prompt, user_prompt, temperature, max_tokens):
+        """Return (cached response or None, key to pass to store())."""
+        key = _sha256(model, system_prompt, temperature, max_tokens, user_prompt)
+
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return dict(response), key
+
+        response = self._shared_get(key)
+        if response is not None:
+            self._store_local(key, response)
+            with self._lock:
+                self.stats['hits'] += 1
+                self.stats['shared_hits'] += 1
+            return dict(response), key
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None, key
+
+    def store(self, key, response):
+        self._store_local(key, response)
+        self._shared_set(key, response)
+
+    def _store_local(self, key, response):
+        with self._lock:
+            self._entries[key] = dict(response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'shared_enabled': bool(self.shared_ttl),
+            }
+
+    def _shared_get(self, key):
+        if not self.shared_ttl:
+            return None
+        try:
+            return caches['default'].get(f'prompt-cache:{key}')
+        except Exception as e:
+            logger.warning("Shared prompt cache read failed: %s", e)
+            return None
+
+    def _shared_set(self, key, response):
+        if not self.shared_ttl:
+            return
+        try:
+            caches['default'].set(f'prompt-cache:{key}', dict(response), self.shared_ttl)
+        except Exception as e:
+            logger.warning("Shared prompt cache write failed: %s", e)
+
+
+response_cache = ResponseCache(
+    max_entries=settings.PROMPT_CACHE_MAX_ENTRIES,
+    shared_ttl=settings.PROMPT_CACHE_SHARED_TTL,
+)
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+def dollars_to_micros(apps, schema_editor):
+    PromptExecution = apps.get_model('promptengine', 'PromptExecution')
+    PromptExecution.objects.update(cost_micros=Round(F('cost_estimate') * 1_000_000))
+
+
+def micros_to_dollars(apps, schema_editor):
+    PromptExecution = apps.get_model('promptengine', 'PromptExecution')
+    PromptExecution.objects.update(cost_estimate=F('cost_micros') / 1_000_000.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promptengine', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promptexecution',
+            name='cost_micros',
+            field=models.PositiveBigIntegerField(default=0, help_text='Estimated cost in millionths of a US dollar'),
+        ),
+        migrations.RunPython(dollars_to_micros, micros_to_dollars),
+        migrations.RemoveField(
+            model_name='promptexecution',
+            name='cost_estimate',
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+TABLE = 'promptengine_promptexecution'
+
+
+def narrow_heap_rows(apps, schema_editor):
+    # PostgreSQL only: move prompt/output text out of line once a row passes
+    # 256 bytes, so scans over the numeric columns read small heap tuples.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'ALTER TABLE {TABLE} SET (toast_tuple_target = 256)')
+
+
+def reset_heap_rows(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'ALTER TABLE {TABLE} RESET (toast_tuple_target)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promptengine', '0002_cost_micros'),
+    ]
+
+    operations = [
+        migrations.RunPython(narrow_heap_rows, reset_heap_rows),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-15 22:57
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promptengine', '0003_execution_toast_target'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('provider', models.CharField(choices=[('openai', 'OpenAI'), ('anthropic', 'Anthropic')], max_length=20)),
+                ('provider_batch_id', models.CharField(max_length=255)),
+                ('category', models.CharField(blank=True, max_length=50)),
+                ('items', models.JSONField(default=list, help_text='execute_prompt arguments, in custom_id order')),
+                ('results', models.JSONField(blank=True, default=list, help_text='execute_prompt-shaped results, in item order')),
+                ('status', models.CharField(choices=[('submitted', 'Submitted'), ('completed', 'Completed'), ('failed', 'Failed')], default='submitted', max_length=20)),
+                ('error_message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-15 23:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promptengine', '0005_execution_lz4_compression'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='promptexecution',
+            index=models.Index(fields=['-created_at'], name='execution_created_desc'),
+        ),
+    ]
@@ -5,25 +5,24 @@ from django.contrib.auth.models import User
 
 class PromptTemplate(models.Model):
     """Reusable prompt templates for various use cases."""
-    CATEGORY_CHOICES = [
-        ('feedback_analysis', 'Customer Feedback Analysis'),
-        ('meeting_summarizer', 'Meeting Notes Summarizer'),
-        ('quiz_generator', 'Quiz Generator'),
-        ('slide_script', 'Slide Script Generator'),
-        ('complaint_response', 'Complaint Response Generator'),
-        ('custom', 'Custom Template'),
-    ]
-    DIFFICULTY_CHOICES = [
-        ('beginner', 'Beginner'),
-        ('intermediate', 'Intermediate'),
-        ('advanced', 'Advanced'),
-    ]
+    class Category(models.TextChoices):
+        FEEDBACK_ANALYSIS = 'feedback_analysis', 'Customer Feedback Analysis'
+        MEETING_SUMMARIZER = 'meeting_summarizer', 'Meeting Notes Summarizer'
+        QUIZ_GENERATOR = 'quiz_generator', 'Quiz Generator'
+        SLIDE_SCRIPT = 'slide_script', 'Slide Script Generator'
+        COMPLAINT_RESPONSE = 'complaint_response', 'Complaint Response Generator'
+        CUSTOM = 'custom', 'Custom Template'
+
+    class Difficulty(models.TextChoices):
+        BEGINNER = 'beginner', 'Beginner'
+        INTERMEDIATE = 'intermediate', 'Intermediate'
+        ADVANCED = 'advanced', 'Advanced'
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
-    category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
-    difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES, default='beginner')
+    category = models.CharField(max_length=50, choices=Category.choices)
+    difficulty = models.CharField(max_length=20, choices=Difficulty.choices, default=Difficulty.BEGINNER)
     system_prompt = models.TextField(help_text="System-level instruction for the AI")
     user_prompt_template = models.TextField(help_text="User prompt template with {placeholders}")
     example_input = models.TextField(blank=True, help_text="Example input to demonstrate usage")
@@ -47,12 +46,16 @@ class PromptTemplate(models.Model):
 
 class PromptExecution(models.Model):
     """Record of each prompt execution for analytics and history."""
-    STATUS_CHOICES = [
-        ('pending', 'Pending'),
-        ('processing', 'Processing'),
-        ('completed', 'Completed'),
-        ('failed', 'Failed'),
-    ]
+    MICROS_PER_DOLLAR = 1_000_000
+
+    # Large text columns that list views leave out of the SELECT.
+    HEAVY_FIELDS = ('input_data', 'output_data', 'user_prompt', 'system_prompt', 'error_message')
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        PROCESSING = 'processing', 'Processing'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     template = models.ForeignKey(PromptTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='executions')
@@ -62,11 +65,11 @@ class PromptExecution(models.Model):
     system_prompt = models.TextField(blank=True)
     user_prompt = models.TextField()
     output_data = models.TextField(blank=True)
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
     model_used = models.CharField(max_length=100, default='gpt-4o-mini')
     tokens_input = models.IntegerField(default=0)
     tokens_output = models.IntegerField(default=0)
-    cost_estimate = models.DecimalField(max_digits=10, decimal_places=6, default=0)
+    cost_micros = models.PositiveBigIntegerField(default=0, help_text="Estimated cost in millionths of a US dollar")
     latency_ms = models.IntegerField(default=0)
     rating = models.IntegerField(null=True, blank=True, help_text="1-5 star rating")
     feedback = models.TextField(blank=True)
@@ -76,6 +79,11 @@ class PromptExecution(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['-created_at'], name='execution_created_desc')]
+
+    @property
+    def cost_dollars(self):
+        return self.cost_micros / self.MICROS_PER_DOLLAR
 
     def __str__(self):
         return f"{self.category} - {self.status} ({self.created_at})"
@@ -135,3 +143,32 @@ class SavedOutput(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class BatchJob(models.Model):
+    """Bulk request submitted to a provider batch endpoint, collected once the provider finishes."""
+    class Provider(models.TextChoices):
+        OPENAI = 'openai', 'OpenAI'
+        ANTHROPIC = 'anthropic', 'Anthropic'
+
+    class Status(models.TextChoices):
+        SUBMITTED = 'submitted', 'Submitted'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    provider = models.CharField(max_length=20, choices=Provider.choices)
+    provider_batch_id = models.CharField(max_length=255)
+    category = models.CharField(max_length=50, blank=True)
+    items = models.JSONField(default=list, help_text="execute_prompt arguments, in custom_id order")
+    results = models.JSONField(default=list, blank=True, help_text="execute_prompt-shaped results, in item order")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.SUBMITTED)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.provider} batch {self.provider_batch_id} ({self.status})"
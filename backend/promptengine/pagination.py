@@ -0,0 +1,127 @@
+import hashlib
+import logging
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+
+COUNT_CACHE_TIMEOUT = 300
+EXECUTION_COUNT_VERSION_KEY = 'promptengine:executions:count_version'
+# Template list pages only change when templates/versions are written; usage counts
+# (bumped with a bare UPDATE) may lag by up to this many seconds
+TEMPLATE_LIST_CACHE_TIMEOUT = 60
+TEMPLATE_LIST_VERSION_KEY = 'promptengine:templates:list_version'
+
+logger = logging.getLogger(__name__)
+
+
+def _bump_version(key):
+    # Runs from post_save/post_delete, so a cache outage must not fail the write
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, None)
+    except Exception as e:
+        logger.warning("Cache version bump failed for %s: %s", key, e)
+
+
+def _current_version(key):
+    """The key's version counter, or None if the cache is unavailable."""
+    try:
+        return cache.get_or_set(key, 1, None)
+    except Exception as e:
+        logger.warning("Cache version read failed for %s: %s", key, e)
+        return None
+
+
+def bump_execution_count_version():
+    """Invalidate every cached execution count by moving to a new key version."""
+    _bump_version(EXECUTION_COUNT_VERSION_KEY)
+
+
+def bump_template_list_version():
+    """Invalidate every cached template list page."""
+    _bump_version(TEMPLATE_LIST_VERSION_KEY)
+
+
+def cached_template_list(request, build):
+    """Serialized template list page for the request URL, from the cache or build().
+
+    If the cache is unavailable the page is built on every request.
+    """
+    version = _current_version(TEMPLATE_LIST_VERSION_KEY)
+    if version is None:
+        return build()
+    signature = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    key = f'promptengine:templates:list:{version}:{signature}'
+    try:
+        data = cache.get(key)
+    except Exception as e:
+        logger.warning("Cached template list read failed: %s", e)
+        data = None
+    if data is None:
+        data = build()
+        try:
+            cache.set(key, data, TEMPLATE_LIST_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning("Cached template list write failed: %s", e)
+    return data
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator whose COUNT(*) is read from the cache unless a refresh is requested.
+
+    With no cache_key, or if the cache is unavailable, it counts like a plain Paginator.
+    """
+
+    def __init__(self, *args, cache_key, refresh=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_key = cache_key
+        self.refresh = refresh
+
+    @cached_property
+    def count(self):
+        if self.cache_key is not None and not self.refresh:
+            try:
+                cached = cache.get(self.cache_key)
+            except Exception as e:
+                logger.warning("Cached execution count read failed: %s", e)
+                cached = None
+            if cached is not None:
+                return cached
+        count = super().count
+        if self.cache_key is not None:
+            try:
+                cache.set(self.cache_key, count, COUNT_CACHE_TIMEOUT)
+            except Exception as e:
+                logger.warning("Cached execution count write failed: %s", e)
+        return count
+
+
+class CachedCountPagination(PageNumberPagination):
+    """Page-number pagination that counts once on the first page and reuses it for later pages.
+
+    The count is keyed on the filtered query's SQL and a version counter that
+    is bumped whenever an execution is saved or deleted.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        sql, params = queryset.query.sql_with_params()
+        signature = hashlib.sha1(f'{sql}|{params!r}'.encode()).hexdigest()
+        version = _current_version(EXECUTION_COUNT_VERSION_KEY)
+        page_number = request.query_params.get(self.page_query_param, '1')
+        # Without a version the count cannot be invalidated, so it is not cached
+        cache_key = None if version is None else f'promptengine:executions:count:{version}:{signature}'
+
+        def paginator_class(*args, **kwargs):
+            return CachedCountPaginator(
+                *args,
+                cache_key=cache_key,
+                refresh=page_number == '1',
+                **kwargs,
+            )
+
+        self.django_paginator_class = paginator_class
+        return super().paginate_queryset(queryset, request, view)
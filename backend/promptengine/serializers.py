@@ -1,5 +1,7 @@
+import orjson
 from rest_framework import serializers
-from .models import PromptTemplate, PromptExecution, PromptVersion, PromptChain, SavedOutput
+from .batch_api import BATCH_FEATURES
+from .models import PromptTemplate, PromptExecution, PromptVersion, PromptChain, SavedOutput, BatchJob
 
 
 class PromptTemplateSerializer(serializers.ModelSerializer):
@@ -12,16 +14,30 @@ class PromptTemplateSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at', 'usage_count', 'avg_rating']
 
     def get_version_count(self, obj):
-        return obj.versions.count()
+        # Annotated on PromptTemplateViewSet querysets; counted directly elsewhere
+        count = getattr(obj, 'version_count', None)
+        return obj.versions.count() if count is None else count
 
 
-class PromptExecutionSerializer(serializers.ModelSerializer):
+class PromptExecutionDetailSerializer(serializers.ModelSerializer):
     template_name = serializers.CharField(source='template.name', read_only=True, default='')
+    cost_estimate = serializers.FloatField(source='cost_dollars', read_only=True)
 
     class Meta:
         model = PromptExecution
-        fields = '__all__'
-        read_only_fields = ['id', 'created_at', 'tokens_input', 'tokens_output', 'cost_estimate', 'latency_ms']
+        exclude = ['cost_micros']
+        read_only_fields = ['id', 'created_at', 'tokens_input', 'tokens_output', 'latency_ms']
+
+
+class PromptExecutionListSerializer(serializers.ModelSerializer):
+    """History rows without the large prompt/output text; fetch the detail for those."""
+    template_name = serializers.CharField(source='template.name', read_only=True, default='')
+    cost_estimate = serializers.FloatField(source='cost_dollars', read_only=True)
+
+    class Meta:
+        model = PromptExecution
+        exclude = PromptExecution.HEAVY_FIELDS + ('cost_micros',)
+        read_only_fields = ['id', 'created_at', 'tokens_input', 'tokens_output', 'latency_ms']
 
 
 class PromptVersionSerializer(serializers.ModelSerializer):
@@ -45,6 +61,13 @@ class SavedOutputSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class BatchJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BatchJob
+        fields = '__all__'
+        read_only_fields = ['id', 'created_at', 'completed_at']
+
+
 # --- Feature-specific request serializers ---
 
 class FeedbackAnalysisRequestSerializer(serializers.Serializer):
@@ -139,9 +162,22 @@ class InjectionTesterRequestSerializer(serializers.Serializer):
 
 class FewShotBuilderRequestSerializer(serializers.Serializer):
     task_description = serializers.CharField()
-    examples = serializers.CharField(help_text="JSON string of input/output pairs")
+    examples = serializers.JSONField(help_text="List of {input, output} pairs, or the same as a JSON string")
     model = serializers.CharField(default='gpt-4o-mini')
 
+    def validate_examples(self, value):
+        if isinstance(value, str):
+            try:
+                value = orjson.loads(value)
+            except orjson.JSONDecodeError:
+                raise serializers.ValidationError("Examples must be valid JSON.")
+        if not isinstance(value, list) or not value:
+            raise serializers.ValidationError("Examples must be a non-empty list of input/output pairs.")
+        for example in value:
+            if not isinstance(example, dict) or not {'input', 'output'} <= example.keys():
+                raise serializers.ValidationError("Each example needs an 'input' and an 'output'.")
+        return value
+
 
 # --- Phase 4: Knowledge Workflow Serializers ---
 
@@ -220,7 +256,7 @@ class ReflectionLoopRequestSerializer(serializers.Serializer):
 
 class ReActAgentRequestSerializer(serializers.Serializer):
     task = serializers.CharField()
-    available_tools = serializers.ListField(child=serializers.CharField(), required=False, default=[])
+    available_tools = serializers.ListField(child=serializers.CharField(), required=False, default=list)
     model = serializers.CharField(default='gpt-4o-mini')
 
 class AgentRoleDesignerRequestSerializer(serializers.Serializer):
@@ -231,7 +267,7 @@ class AgentRoleDesignerRequestSerializer(serializers.Serializer):
 
 class CoordinatorRouterRequestSerializer(serializers.Serializer):
     task = serializers.CharField()
-    agents = serializers.ListField(child=serializers.CharField(), required=False, default=[])
+    agents = serializers.ListField(child=serializers.CharField(), required=False, default=list)
     model = serializers.CharField(default='gpt-4o-mini')
 
 # --- Phase 15: Auto-Optimization Serializers ---
@@ -278,3 +314,11 @@ class MemoryAwareRequestSerializer(serializers.Serializer):
     conversation_type = serializers.CharField(required=False, default='')
     context_requirements = serializers.CharField(required=False, default='')
     model = serializers.CharField(default='gpt-4o-mini')
+
+
+# --- Provider Batch Jobs ---
+
+class BatchJobRequestSerializer(serializers.Serializer):
+    feature = serializers.ChoiceField(choices=list(BATCH_FEATURES))
+    inputs = serializers.ListField(child=serializers.CharField(), min_length=1, max_length=10000)
+    model = serializers.CharField(default='gpt-4o-mini')
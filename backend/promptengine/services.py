@@ -4,15 +4,62 @@ plus custom prompt execution.
 """
 import io
 import re
+import copy
 import time
 import json
+import atexit
+import string
 import logging
+import functools
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import httpx
+import orjson
 from django.conf import settings
 
+from langchain_core.messages import HumanMessage, SystemMessage
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
+try:
+    from langchain_openai import ChatOpenAI
+except ImportError:
+    ChatOpenAI = None
+try:
+    from langchain_anthropic import ChatAnthropic
+except ImportError:
+    ChatAnthropic = None
+try:
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.oxml import parse_xml as docx_parse_xml
+    from docx.oxml.ns import nsdecls as docx_nsdecls
+    from docx.shared import Pt, RGBColor
+except ImportError:
+    Document = None
+try:
+    from pptx import Presentation
+    from pptx.dml.color import RGBColor as PptxRGBColor
+    from pptx.enum.text import PP_ALIGN
+    from pptx.oxml import parse_xml
+    from pptx.oxml.ns import nsdecls
+    from pptx.util import Emu, Inches, Pt as PptxPt
+except ImportError:
+    Presentation = None
+
+from .cache import response_cache
+
 logger = logging.getLogger(__name__)
 
 # System prompts derived from the notebook
-SYSTEM_PROMPTS = {
+SYSTEM_PROMPTS = MappingProxyType({
     'feedback_analysis': (
         "You are an assistant that supports a healthcare provider in analyzing patient reviews.\n\n"
         "Your goal is to extract key information from the user data provided below, including the "
@@ -76,145 +123,661 @@ SYSTEM_PROMPTS = {
         "or guidance available.\n\n"
         "Also output a JSON block at the end with: sentiment, urgency (low/medium/high), category"
     ),
-}
+})
+
+
+# Shared connection pools so LLM calls reuse warm TCP/TLS sessions instead of
+# handshaking on every request.
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+_HTTP_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+_HTTP_CLIENT = httpx.Client(http2=True, limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+atexit.register(_HTTP_CLIENT.close)
+
+
+def _llm_provider(model_name):
+    name = model_name.lower()
+    return 'anthropic' if 'claude' in name or 'anthropic' in name else 'openai'
+
+
+@functools.lru_cache(maxsize=32)
+def _make_llm(provider, model_name, temperature, max_tokens):
+    """Build an LLM client once per distinct configuration.
+
+    Raises on failure so that errors are not memoized.
+    """
+    if provider == 'anthropic':
+        if ChatAnthropic is None:
+            raise ImportError("langchain-anthropic is not installed")
+        return ChatAnthropic(
+            model=model_name,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            api_key=settings.ANTHROPIC_API_KEY,
+        )
+    if ChatOpenAI is None:
+        raise ImportError("langchain-openai is not installed")
+    return ChatOpenAI(
+        model=model_name,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        api_key=settings.OPENAI_API_KEY,
+        stream_usage=True,
+        http_client=_HTTP_CLIENT,
+    )
 
 
 def get_llm(model_name='gpt-4o-mini', temperature=0.0, max_tokens=1024):
-    """Create and return an LLM instance based on model name."""
+    """Return a cached LLM instance for the model settings, or None if it cannot be created."""
     try:
-        if 'claude' in model_name.lower() or 'anthropic' in model_name.lower():
-            from langchain_anthropic import ChatAnthropic
-            return ChatAnthropic(
-                model=model_name,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                api_key=settings.ANTHROPIC_API_KEY,
-            )
-        else:
-            from langchain_openai import ChatOpenAI
-            return ChatOpenAI(
-                model=model_name,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                api_key=settings.OPENAI_API_KEY,
-            )
+        return _make_llm(_llm_provider(model_name), model_name, temperature, max_tokens)
+    except Exception as e:
+        logger.warning("Failed to create LLM (%s): %s. Using mock response.", model_name, e)
+        return None
+
+
+class _RateLimiter:
+    """Token-bucket pacing of provider calls, shared by every thread in the
+    process so fan-outs stay under the provider's requests-per-minute limit."""
+
+    def __init__(self, per_minute, burst=1):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.tolerance = self.interval * max(burst - 1, 0)
+        self._ready_at = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Claim the next call slot and return how many seconds to wait before using it."""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            ready_at = max(self._ready_at, now)
+            self._ready_at = ready_at + self.interval
+            return max(ready_at - self.tolerance - now, 0.0)
+
+    def wait(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+_RATE_LIMITER = _RateLimiter(settings.LLM_REQUESTS_PER_MINUTE, settings.LLM_BURST)
+
+
+def _elapsed_ms(start_ns):
+    return (time.perf_counter_ns() - start_ns) // 1_000_000
+
+
+@functools.lru_cache(maxsize=16)
+def _encoding_for(model):
+    """tiktoken encoding for model, or None when tiktoken/BPE files are unavailable.
+
+    Non-OpenAI models fall back to cl100k_base, which is a close enough
+    approximation for cost estimates.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding('cl100k_base')
     except Exception as e:
-        logger.warning(f"Failed to create LLM ({model_name}): {e}. Using mock response.")
+        logger.warning("tiktoken encoding unavailable for %s: %s", model, e)
         return None
 
 
+# Rough characters-per-token ratio for English BPE text
+_CHARS_PER_TOKEN = 4
+# Only short texts (system prompts, typical inputs) are worth memoizing
+_COUNT_CACHE_MAX_CHARS = 8192
+
+
+def _approx_tokens(text):
+    return max(1, len(text) // _CHARS_PER_TOKEN) if text else 0
+
+
+@functools.lru_cache(maxsize=2048)
+def _count_tokens_cached(text, model):
+    return _count_tokens(text, model)
+
+
+def _count_tokens(text, model):
+    enc = _encoding_for(model)
+    if enc is None:
+        return _approx_tokens(text)
+    return len(enc.encode_ordinary(text))
+
+
+def count_tokens(text, model='gpt-4o-mini'):
+    """Approximate token count for text, used when the provider reports no usage."""
+    if not text:
+        return 0
+    if len(text) > _COUNT_CACHE_MAX_CHARS:
+        return _count_tokens(text, model)
+    return _count_tokens_cached(text, model)
+
+
+def _mock_result(system_prompt, user_prompt, model, start_ns):
+    """Simulated response used when no API key is configured."""
+    return {
+        'output': (
+            f"[Demo Mode - No API key configured]\n\n"
+            f"This is a simulated response for the given prompt. "
+            f"Configure OPENAI_API_KEY or ANTHROPIC_API_KEY in your .env file "
+            f"to get real AI responses.\n\n"
+            f"System prompt: {system_prompt[:100]}...\n"
+            f"User input length: {len(user_prompt)} chars"
+        ),
+        'tokens_input': _approx_tokens(system_prompt) + _approx_tokens(user_prompt),
+        'tokens_output': 50,
+        'cost_estimate': 0.0,
+        'latency_ms': _elapsed_ms(start_ns),
+        'model': model,
+    }
+
+
+def _cache_hit_result(cached, start_ns):
+    cached.update({
+        'tokens_input': 0,
+        'tokens_output': 0,
+        'cost_estimate': 0.0,
+        'latency_ms': _elapsed_ms(start_ns),
+        'cache_hit': True,
+    })
+    return cached
+
+
+@functools.lru_cache(maxsize=256)
+def _system_message(system_prompt, provider):
+    """Prebuilt SystemMessage per distinct system prompt, shared across calls."""
+    if provider == 'anthropic':
+        # Mark the static system prompt as a cacheable prefix; OpenAI caches
+        # stable leading messages automatically.
+        return SystemMessage(content=[
+            {'type': 'text', 'text': system_prompt, 'cache_control': {'type': 'ephemeral'}},
+        ])
+    return SystemMessage(content=system_prompt)
+
+
+def _build_messages(system_prompt, user_prompt, model):
+    if system_prompt:
+        return [_system_message(system_prompt, _llm_provider(model)), HumanMessage(content=user_prompt)]
+    return [HumanMessage(content=user_prompt)]
+
+
+def _response_result(response, system_prompt, user_prompt, model, start_ns):
+    usage = getattr(response, 'usage_metadata', None) or {}
+    tokens_in = usage.get('input_tokens')
+    if tokens_in is None:
+        tokens_in = count_tokens(system_prompt, model) + count_tokens(user_prompt, model)
+    tokens_out = usage.get('output_tokens')
+    if tokens_out is None:
+        tokens_out = count_tokens(response.content, model)
+    details = usage.get('input_token_details') or {}
+    cache_read = details.get('cache_read') or 0
+    cache_write = details.get('cache_creation') or 0
+    result = {
+        'output': response.content,
+        'tokens_input': tokens_in,
+        'tokens_output': tokens_out,
+        'tokens_cached': cache_read,
+        'cost_estimate': _estimate_cost(model, tokens_in, tokens_out, cache_read, cache_write),
+        'latency_ms': _elapsed_ms(start_ns),
+        'model': model,
+    }
+    logger.debug(
+        "LLM call model=%s tokens_in=%d tokens_out=%d cached=%d latency_ms=%d",
+        model, tokens_in, tokens_out, cache_read, result['latency_ms'],
+    )
+    return result
+
+
+def _error_result(error, model, start_ns):
+    logger.error("LLM execution failed: %s", error)
+    return {
+        'output': '',
+        'error': str(error),
+        'tokens_input': 0,
+        'tokens_output': 0,
+        'cost_estimate': 0.0,
+        'latency_ms': _elapsed_ms(start_ns),
+        'model': model,
+    }
+
+
+def _cacheable(temperature):
+    """Low-temperature calls are close enough to deterministic to reuse an exact match."""
+    return temperature <= settings.PROMPT_CACHE_MAX_TEMPERATURE
+
+
+# Cache key -> Future of the call currently computing it, so identical concurrent
+# requests that all miss the cache share one LLM call instead of each making one
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _join_inflight(key):
+    """Return (future, leader). The leader makes the call and must pass its
+    result to _finish_inflight; everyone else waits on the future."""
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(key)
+        if future is not None:
+            return future, False
+        future = _INFLIGHT[key] = Future()
+        return future, True
+
+
+def _finish_inflight(key, future, result):
+    """Resolve a leader's future; result is None if the leader was interrupted."""
+    with _INFLIGHT_LOCK:
+        del _INFLIGHT[key]
+    future.set_result(result)
+
+
+def _shared_result(result, start_ns):
+    """A waiting caller's copy of the leader's result."""
+    if 'error' in result:
+        return {**result, 'latency_ms': _elapsed_ms(start_ns)}
+    return _cache_hit_result(dict(result), start_ns)
+
+
+def _invoke(llm, system_prompt, user_prompt, model, start_ns):
+    _RATE_LIMITER.wait()
+    try:
+        response = llm.invoke(_build_messages(system_prompt, user_prompt, model))
+        return _response_result(response, system_prompt, user_prompt, model, start_ns)
+    except Exception as e:
+        return _error_result(e, model, start_ns)
+
+
 def execute_prompt(system_prompt, user_prompt, model='gpt-4o-mini', temperature=0.0, max_tokens=1024):
     """Execute a prompt and return the result with metadata."""
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
 
     llm = get_llm(model, temperature, max_tokens)
 
     if llm is None:
-        # Return a mock response when no API key is configured
-        elapsed = int((time.time() - start_time) * 1000)
-        return {
-            'output': (
-                f"[Demo Mode - No API key configured]\n\n"
-                f"This is a simulated response for the given prompt. "
-                f"Configure OPENAI_API_KEY or ANTHROPIC_API_KEY in your .env file "
-                f"to get real AI responses.\n\n"
-                f"System prompt: {system_prompt[:100]}...\n"
-                f"User input length: {len(user_prompt)} chars"
-            ),
-            'tokens_input': len(user_prompt.split()),
-            'tokens_output': 50,
-            'cost_estimate': 0.0,
-            'latency_ms': elapsed,
-            'model': model,
-        }
-
+        return _mock_result(system_prompt, user_prompt, model, start_ns)
+
+    # (Near-)deterministic calls are served from the response cache when possible
+    cache_key = None
+    if _cacheable(temperature):
+        cached, cache_key = response_cache.lookup(model, system_prompt, user_prompt, temperature, max_tokens)
+        if cached is not None:
+            return _cache_hit_result(cached, start_ns)
+
+    if cache_key is None:
+        return _invoke(llm, system_prompt, user_prompt, model, start_ns)
+
+    future, leader = _join_inflight(cache_key)
+    if not leader:
+        shared = future.result()
+        if shared is not None:
+            return _shared_result(shared, start_ns)
+        return _invoke(llm, system_prompt, user_prompt, model, start_ns)
+
+    result = None
     try:
-        messages = []
-        if system_prompt:
-            messages.append(('system', system_prompt))
-        messages.append(('human', user_prompt))
+        result = _invoke(llm, system_prompt, user_prompt, model, start_ns)
+        if 'error' not in result:
+            response_cache.store(cache_key, result)
+    finally:
+        _finish_inflight(cache_key, future, result)
+    return result
 
-        response = llm.invoke(messages)
-        elapsed = int((time.time() - start_time) * 1000)
 
-        tokens_in = getattr(response, 'usage_metadata', {}).get('input_tokens', len(user_prompt.split()))
-        tokens_out = getattr(response, 'usage_metadata', {}).get('output_tokens', len(response.content.split()))
+def stream_prompt(system_prompt, user_prompt, model='gpt-4o-mini', temperature=0.0, max_tokens=1024):
+    """Stream a prompt execution.
 
-        return {
-            'output': response.content,
-            'tokens_input': tokens_in,
-            'tokens_output': tokens_out,
-            'cost_estimate': _estimate_cost(model, tokens_in, tokens_out),
-            'latency_ms': elapsed,
-            'model': model,
-        }
+    Yields ('chunk', text) as output arrives, then a single ('result', dict)
+    carrying the same metadata execute_prompt returns.
+    """
+    start_ns = time.perf_counter_ns()
+
+    llm = get_llm(model, temperature, max_tokens)
+
+    if llm is None:
+        result = _mock_result(system_prompt, user_prompt, model, start_ns)
+        yield 'chunk', result['output']
+        yield 'result', result
+        return
+
+    cache_key = None
+    if _cacheable(temperature):
+        cached, cache_key = response_cache.lookup(model, system_prompt, user_prompt, temperature, max_tokens)
+        if cached is not None:
+            result = _cache_hit_result(cached, start_ns)
+            yield 'chunk', result['output']
+            yield 'result', result
+            return
+
+    _RATE_LIMITER.wait()
+    response = None
+    try:
+        for chunk in llm.stream(_build_messages(system_prompt, user_prompt, model)):
+            response = chunk if response is None else response + chunk
+            if chunk.content:
+                yield 'chunk', chunk.content
+        if response is None:
+            raise ValueError("LLM returned an empty stream")
+        result = _response_result(response, system_prompt, user_prompt, model, start_ns)
     except Exception as e:
-        elapsed = int((time.time() - start_time) * 1000)
-        logger.error(f"LLM execution failed: {e}")
+        yield 'result', _error_result(e, model, start_ns)
+        return
+    if cache_key is not None:
+        response_cache.store(cache_key, result)
+    yield 'result', result
+
+
+def stream_json_items(events, prefix):
+    """Pass stream_prompt events through, adding ('item', obj) for each
+    completed JSON value at ijson prefix (e.g. 'steps.item') as it arrives.
+
+    Incremental parsing stops quietly on anything ijson cannot follow (prose,
+    trailing fences); clients still get the full output in the final result.
+    """
+    if ijson is None:
+        yield from events
+        return
+    items = ijson.sendable_list()
+    parser = ijson.items_coro(items, prefix, use_float=True)
+    # Top-level arrays are addressed as 'item...', everything else lives in an object
+    opener = '[' if prefix.split('.', 1)[0] == 'item' else '{'
+    started = False
+    for kind, value in events:
+        yield kind, value
+        if kind != 'chunk' or parser is None:
+            continue
+        if not started:
+            # Skip any preamble such as a ```json fence before the JSON value
+            start = value.find(opener)
+            if start < 0:
+                continue
+            value, started = value[start:], True
+        try:
+            parser.send(value.encode())
+        except ijson.JSONError:
+            parser = None
+        for item in items:
+            yield 'item', item
+        del items[:]
+
+
+# LLM calls are network-bound, so a small thread pool overlaps their round trips
+# inside the synchronous request cycle.
+_LLM_EXECUTOR = ThreadPoolExecutor(max_workers=settings.LLM_MAX_CONCURRENCY, thread_name_prefix='llm')
+
+
+def execute_prompt_batch(items):
+    """Run independent execute_prompt calls concurrently and return results in item order.
+
+    Each item is a dict of execute_prompt keyword arguments. Call it from
+    request code only, never from inside another pooled call.
+    """
+    if len(items) <= 1:
+        return [execute_prompt(**item) for item in items]
+    return list(_LLM_EXECUTOR.map(lambda item: execute_prompt(**item), items))
+
+
+def execute_prompt_graph(deps, build_item):
+    """Run execute_prompt calls whose inputs depend on earlier calls' results.
+
+    deps[i] lists the indexes call i waits for (earlier indexes only);
+    build_item(i, results) returns call i's execute_prompt kwargs once they
+    are done. Every call starts as soon as its own dependencies finish rather
+    than waiting for a whole level. Returns (results, critical path latency
+    in ms). Same calling rules as execute_prompt_batch.
+    """
+    results = [None] * len(deps)
+    finished_at = [0] * len(deps)
+    waiting = {i: set(d) for i, d in enumerate(deps)}
+    running = {}
+
+    def submit_ready():
+        for i in [i for i, pending in waiting.items() if not pending]:
+            del waiting[i]
+            running[_LLM_EXECUTOR.submit(execute_prompt, **build_item(i, results))] = i
+
+    submit_ready()
+    while running:
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            i = running.pop(future)
+            results[i] = future.result()
+            finished_at[i] = max((finished_at[d] for d in deps[i]), default=0) + results[i].get('latency_ms', 0)
+            for pending in waiting.values():
+                pending.discard(i)
+        submit_ready()
+    return results, max(finished_at, default=0)
+
+
+# (input, output) USD per 1K tokens
+_MODEL_PRICING = {
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-4o': (0.005, 0.015),
+    'gpt-4': (0.03, 0.06),
+    'claude-3-5-sonnet-20241022': (0.003, 0.015),
+    'claude-3-haiku-20240307': (0.00025, 0.00125),
+}
+_DEFAULT_PRICING = (0.001, 0.002)
+
+# Price multipliers for input tokens served from (or written to) the provider prompt cache
+_CACHE_READ_FACTOR = {'openai': 0.5, 'anthropic': 0.1}
+_CACHE_WRITE_FACTOR = {'openai': 1.0, 'anthropic': 1.25}
+
+
+@functools.lru_cache(maxsize=64)
+def _cost_rates(model):
+    """Per-token (input, output, cache read, cache write) USD rates for model."""
+    per_1k_in, per_1k_out = _MODEL_PRICING.get(model, _DEFAULT_PRICING)
+    rate_in, rate_out = per_1k_in / 1000, per_1k_out / 1000
+    provider = _llm_provider(model)
+    return rate_in, rate_out, rate_in * _CACHE_READ_FACTOR[provider], rate_in * _CACHE_WRITE_FACTOR[provider]
+
+
+def _estimate_cost(model, tokens_in, tokens_out, cache_read=0, cache_write=0):
+    """Rough cost estimation based on model pricing.
+
+    tokens_in includes any cache_read/cache_write tokens, which are billed at
+    the provider's discounted or premium prompt-caching rates.
+    """
+    rate_in, rate_out, rate_read, rate_write = _cost_rates(model)
+    return round(
+        (tokens_in - cache_read - cache_write) * rate_in + cache_read * rate_read
+        + cache_write * rate_write + tokens_out * rate_out,
+        6,
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_prompt(template):
+    """Split a str.format-style template into (literal, field_name) segments once."""
+    segments = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if spec or conversion:
+            raise ValueError(f"Unsupported placeholder format in prompt template: {{{field}}}")
+        segments.append((literal, field))
+    return tuple(segments)
+
+
+def render_prompt(template, **params):
+    """Equivalent of template.format(**params) for plain {name} placeholders, without re-parsing."""
+    parts = []
+    for literal, field in _compile_prompt(template):
+        parts.append(literal)
+        if field is not None:
+            parts.append(str(params[field]))
+    return ''.join(parts)
+
+
+@dataclass
+class Usage:
+    """Running token, cost and latency totals for a feature made of several LLM calls."""
+    tokens_input: int = 0
+    tokens_output: int = 0
+    cost_estimate: float = 0.0
+    latency_ms: int = 0
+
+    def add(self, result, latency=True):
+        """Add one call's usage; latency=False when the caller accounts for time itself."""
+        self.tokens_input += result.get('tokens_input', 0)
+        self.tokens_output += result.get('tokens_output', 0)
+        self.cost_estimate += result.get('cost_estimate', 0)
+        if latency:
+            self.latency_ms += result.get('latency_ms', 0)
+
+    def add_concurrent(self, results, latency_ms=None):
+        """Add calls that ran side by side: they take as long as the slowest one,
+        or latency_ms when the caller measured the critical path."""
+        for result in results:
+            self.add(result, latency=False)
+        if latency_ms is None:
+            latency_ms = max((r.get('latency_ms', 0) for r in results), default=0)
+        self.latency_ms += latency_ms
+
+    def as_result(self, output, model, **extra):
         return {
-            'output': '',
-            'error': str(e),
-            'tokens_input': 0,
-            'tokens_output': 0,
-            'cost_estimate': 0.0,
-            'latency_ms': elapsed,
+            'output': output,
+            **extra,
+            'tokens_input': self.tokens_input,
+            'tokens_output': self.tokens_output,
+            'cost_estimate': self.cost_estimate,
+            'latency_ms': self.latency_ms,
             'model': model,
         }
 
 
-def _estimate_cost(model, tokens_in, tokens_out):
-    """Rough cost estimation based on model pricing."""
-    pricing = {
-        'gpt-4o-mini': (0.00015, 0.0006),
-        'gpt-4o': (0.005, 0.015),
-        'gpt-4': (0.03, 0.06),
-        'claude-3-5-sonnet-20241022': (0.003, 0.015),
-        'claude-3-haiku-20240307': (0.00025, 0.00125),
+# --- Feature implementations ---
+
+def _feedback_call(review_text, model, temperature):
+    return {
+        'system_prompt': SYSTEM_PROMPTS['feedback_analysis'],
+        'user_prompt': f"---\nHere is the data:\n{review_text}",
+        'model': model,
+        'temperature': temperature,
     }
-    rates = pricing.get(model, (0.001, 0.002))
-    return round((tokens_in / 1000 * rates[0]) + (tokens_out / 1000 * rates[1]), 6)
 
 
-# --- Feature implementations ---
+# The whole review is a rating and nothing else, e.g. "5/5", "4.5 stars", "5 out of 5."
+_BARE_RATING_RE = re.compile(r'\s*(\d(?:\.\d)?)\s*(?:/\s*5|out\s+of\s+5|stars?)\s*[.!]*\s*', re.IGNORECASE)
+
+
+def _feedback_fast_path(review_text):
+    """Deterministic analysis for reviews that are only a positive rating, or None to use the LLM.
+
+    Any other text, however short, can qualify or contradict the rating
+    ("expected 5 stars but he was rude"), so it always goes to the model.
+    """
+    if not settings.FEEDBACK_FAST_PATH:
+        return None
+    start_ns = time.perf_counter_ns()
+    match = _BARE_RATING_RE.fullmatch(review_text)
+    if match is None:
+        return None
+    rating = float(match.group(1))
+    if not 3.5 <= rating <= 5:
+        return None
+    analysis = {
+        'patient_name': None,
+        'consulting_doctor': None,
+        'review_rating': rating,
+        'review_description': review_text.strip(),
+        'satisfaction': True,
+        'issue_tags': '',
+    }
+    logger.info("Feedback fast path: rating=%s", rating)
+    return {
+        'output': _json_pretty(analysis),
+        'tokens_input': 0,
+        'tokens_output': 0,
+        'cost_estimate': 0.0,
+        'latency_ms': _elapsed_ms(start_ns),
+        'model': 'heuristic',
+    }
+
 
 def analyze_feedback(review_text, model='gpt-4o-mini', temperature=0.0):
-    system_prompt = SYSTEM_PROMPTS['feedback_analysis']
-    user_prompt = f"---\nHere is the data:\n{review_text}"
-    return execute_prompt(system_prompt, user_prompt, model, temperature)
+    return _feedback_fast_path(review_text) or execute_prompt(**_feedback_call(review_text, model, temperature))
+
+
+def _meeting_call(transcript, model, temperature):
+    return {
+        'system_prompt': SYSTEM_PROMPTS['meeting_summarizer'],
+        'user_prompt': f"---\nBelow is the transcript:\n{transcript}",
+        'model': model,
+        'temperature': temperature,
+    }
 
 
 def summarize_meeting(transcript, model='gpt-4o-mini', temperature=0.0):
-    system_prompt = SYSTEM_PROMPTS['meeting_summarizer']
-    user_prompt = f"---\nBelow is the transcript:\n{transcript}"
-    return execute_prompt(system_prompt, user_prompt, model, temperature)
+    return execute_prompt(**_meeting_call(transcript, model, temperature))
+
+
+def stream_meeting_summary(transcript, model='gpt-4o-mini', temperature=0.0):
+    return stream_prompt(**_meeting_call(transcript, model, temperature))
+
+
+def _quiz_call(content, num_questions=5, difficulty_mix='2 easy, 2 intermediate, 1 hard',
+               model='gpt-4o-mini', temperature=0.0):
+    return {
+        'system_prompt': SYSTEM_PROMPTS['quiz_generator'],
+        'user_prompt': (
+            f"Generate {num_questions} questions with the following difficulty distribution: {difficulty_mix}\n"
+            f"---\nBelow is the information on which you have to generate the Quiz:\n{content}"
+        ),
+        'model': model,
+        'temperature': temperature,
+        'max_tokens': 2048,
+    }
 
 
 def generate_quiz(content, num_questions=5, difficulty_mix='2 easy, 2 intermediate, 1 hard',
                   model='gpt-4o-mini', temperature=0.0):
-    system_prompt = SYSTEM_PROMPTS['quiz_generator']
-    user_prompt = (
-        f"Generate {num_questions} questions with the following difficulty distribution: {difficulty_mix}\n"
-        f"---\nBelow is the information on which you have to generate the Quiz:\n{content}"
+    return execute_prompt(**_quiz_call(content, num_questions, difficulty_mix, model, temperature))
+
+
+def stream_quiz(content, num_questions=5, difficulty_mix='2 easy, 2 intermediate, 1 hard',
+                model='gpt-4o-mini', temperature=0.0):
+    """Streaming generate_quiz that also emits each question as soon as it is complete."""
+    return stream_json_items(
+        stream_prompt(**_quiz_call(content, num_questions, difficulty_mix, model, temperature)), 'item'
     )
-    return execute_prompt(system_prompt, user_prompt, model, temperature, max_tokens=2048)
+
+
+def _slide_call(topic, num_slides, style, model, temperature):
+    return {
+        'system_prompt': SYSTEM_PROMPTS['slide_script'],
+        'user_prompt': (
+            f"Generate a {style} slide script on the topic: {topic}\n"
+            f"Create exactly {num_slides} slides.\n"
+            f"Please ensure that each slide contains enough information to provide a clear overview."
+        ),
+        'model': model,
+        'temperature': temperature,
+    }
 
 
 def generate_slide_script(topic, num_slides=3, style='professional',
                           model='gpt-4o-mini', temperature=0.7):
-    system_prompt = SYSTEM_PROMPTS['slide_script']
-    user_prompt = (
-        f"Generate a {style} slide script on the topic: {topic}\n"
-        f"Create exactly {num_slides} slides.\n"
-        f"Please ensure that each slide contains enough information to provide a clear overview."
-    )
-    return execute_prompt(system_prompt, user_prompt, model, temperature)
+    return execute_prompt(**_slide_call(topic, num_slides, style, model, temperature))
+
+
+def stream_slide_script(topic, num_slides=3, style='professional',
+                        model='gpt-4o-mini', temperature=0.7):
+    """Streaming generate_slide_script that also emits each slide as soon as it is complete."""
+    return stream_json_items(stream_prompt(**_slide_call(topic, num_slides, style, model, temperature)), 'item')
+
+
+@functools.lru_cache(maxsize=256)
+def _complaint_system(agent_name, company_name):
+    """Rendered complaint system prompt; the same few agent/company pairs recur."""
+    return render_prompt(SYSTEM_PROMPTS['complaint_response'], agent_name=agent_name, company_name=company_name)
 
 
 def generate_complaint_response(complaint, company_name='Our Company', agent_name='Support Agent',
                                  model='gpt-4o-mini', temperature=0.3):
-    system_prompt = SYSTEM_PROMPTS['complaint_response'].format(
-        agent_name=agent_name, company_name=company_name
-    )
+    system_prompt = _complaint_system(agent_name, company_name)
     user_prompt = f"User complaint:\n{complaint}"
     return execute_prompt(system_prompt, user_prompt, model, temperature)
 
@@ -224,9 +787,14 @@ def execute_custom_prompt(system_prompt='', user_prompt='', model='gpt-4o-mini',
     return execute_prompt(system_prompt, user_prompt, model, temperature, max_tokens)
 
 
+def stream_custom_prompt(system_prompt='', user_prompt='', model='gpt-4o-mini',
+                         temperature=0.7, max_tokens=1024):
+    return stream_prompt(system_prompt, user_prompt, model, temperature, max_tokens)
+
+
 # --- Advanced Prompt Engineering System Prompts ---
 
-ADVANCED_PROMPTS = {
+ADVANCED_PROMPTS = MappingProxyType({
     'prompt_grader': (
         "You are a senior prompt engineering expert. Analyze the given prompt and return a JSON object with:\n"
         "{\n"
@@ -309,8 +877,16 @@ ADVANCED_PROMPTS = {
         "Please fix the output to match the required schema. Return ONLY valid JSON."
     ),
 
-    'self_correct_critic': (
-        "You are a critical reviewer. Analyze the following AI-generated response and identify issues.\n\n"
+    'self_correct_reviser': (
+        "You are a revision expert. Given the original response and the critic's feedback, "
+        "produce an improved version that addresses ALL identified issues.\n\n"
+        "Maintain the original intent and format while fixing every issue noted by the critic. "
+        "Do not mention that this is a revision - just output the improved response directly."
+    ),
+
+    'self_correct_combined': (
+        "You are a critical reviewer and revision expert. Analyze the following AI-generated response, "
+        "identify issues, and if it falls short, rewrite it in the same pass.\n\n"
         "Evaluate on:\n"
         "1. Factual accuracy - any incorrect claims?\n"
         "2. Completeness - anything missing from the task requirements?\n"
@@ -324,18 +900,14 @@ ADVANCED_PROMPTS = {
         '    {"type": "<accuracy|completeness|logic|clarity|format>", "description": "<specific issue>", "severity": "<high|medium|low>"}\n'
         "  ],\n"
         '  "passes_threshold": <true if quality_score >= 7>,\n'
-        '  "revision_instructions": "<specific instructions for improving the response>"\n'
+        '  "revision_instructions": "<specific instructions for improving the response>",\n'
+        '  "revised_output": "<if passes_threshold is false, the complete improved response addressing ALL '
+        'issues, keeping the original intent and format and without mentioning that it is a revision; '
+        'otherwise an empty string>"\n'
         "}\n"
         "Return ONLY valid JSON."
     ),
 
-    'self_correct_reviser': (
-        "You are a revision expert. Given the original response and the critic's feedback, "
-        "produce an improved version that addresses ALL identified issues.\n\n"
-        "Maintain the original intent and format while fixing every issue noted by the critic. "
-        "Do not mention that this is a revision - just output the improved response directly."
-    ),
-
     'quality_gate_safety': (
         "You are a content safety and policy reviewer. Analyze the following content for:\n"
         "1. Harmful or offensive content\n"
@@ -355,11 +927,25 @@ ADVANCED_PROMPTS = {
         "Return ONLY valid JSON."
     ),
 
-    'quality_gate_reviser': (
-        "You are a content editor. The following content failed a quality review. "
-        "Revise it to address ALL identified issues while preserving the original meaning and intent.\n\n"
+    'quality_gate_reviser_validated': (
+        "You are a content editor and policy reviewer. The following content failed a quality review. "
+        "Revise it to address ALL identified issues while preserving the original meaning and intent, "
+        "then review your revision against the same policy.\n\n"
         "Issues to fix:\n{issues}\n\n"
-        "Output ONLY the revised content, no meta-commentary."
+        "Review the revision for: harmful or offensive content, bias or discrimination, factual "
+        "inaccuracies, privacy violations (PII exposure), completeness, and professional tone.\n\n"
+        "Return a JSON object:\n"
+        "{{\n"
+        '  "revised_content": "<the complete revised content, no meta-commentary>",\n'
+        '  "validation": {{\n'
+        '    "passed": <true/false>,\n'
+        '    "checks": [\n'
+        '      {{"check": "<check name>", "status": "<pass|fail|warning>", "details": "<explanation>"}}\n'
+        "    ],\n"
+        '    "revision_needed": "<remaining fixes required if failed, or empty string>"\n'
+        "  }}\n"
+        "}}\n"
+        "Return ONLY valid JSON."
     ),
 
     'decomposition_planner': (
@@ -369,10 +955,11 @@ ADVANCED_PROMPTS = {
         "{\n"
         '  "task_analysis": "<brief analysis of the overall task>",\n'
         '  "sub_tasks": [\n'
-        '    {"step": <number>, "title": "<short title>", "instruction": "<detailed instruction for this sub-task>", "depends_on": "<what input this step needs>"}\n'
+        '    {"step": <number>, "title": "<short title>", "instruction": "<detailed instruction for this sub-task>", "depends_on": [<step numbers of earlier sub-tasks whose output this step needs>]}\n'
         "  ]\n"
         "}\n"
-        "Create 3-6 sub-tasks. Return ONLY valid JSON."
+        "Create 3-6 sub-tasks. Use an empty depends_on list for steps that need no earlier output, "
+        "so independent steps can run in parallel. Return ONLY valid JSON."
     ),
 
     'decomposition_integrator': (
@@ -880,20 +1467,29 @@ ADVANCED_PROMPTS = {
         "}\n"
         "Return ONLY valid JSON."
     ),
-}
+})
 
 
 # --- Phase 1: Prompt Quality Core ---
 
-def grade_prompt(prompt_text, task_type='', domain='', model='gpt-4o-mini'):
-    """Analyze and score a prompt across quality dimensions."""
-    system_prompt = ADVANCED_PROMPTS['prompt_grader']
+def _grade_call(prompt_text, task_type, domain, model):
     user_prompt = f"Analyze this prompt:\n\n---\n{prompt_text}\n---"
     if task_type:
         user_prompt += f"\n\nTask type: {task_type}"
     if domain:
         user_prompt += f"\nDomain: {domain}"
-    return execute_prompt(system_prompt, user_prompt, model, temperature=0.1, max_tokens=2048)
+    return {
+        'system_prompt': ADVANCED_PROMPTS['prompt_grader'],
+        'user_prompt': user_prompt,
+        'model': model,
+        'temperature': 0.1,
+        'max_tokens': 2048,
+    }
+
+
+def grade_prompt(prompt_text, task_type='', domain='', model='gpt-4o-mini'):
+    """Analyze and score a prompt across quality dimensions."""
+    return execute_prompt(**_grade_call(prompt_text, task_type, domain, model))
 
 
 def optimize_prompt(prompt_text, grading_output, model='gpt-4o-mini'):
@@ -908,8 +1504,11 @@ def optimize_prompt(prompt_text, grading_output, model='gpt-4o-mini'):
 
 def compare_prompt_outputs(prompt_a, prompt_b, test_input, model='gpt-4o-mini'):
     """Run two prompts against the same input and judge results."""
-    result_a = execute_prompt(prompt_a, test_input, model, temperature=0.3)
-    result_b = execute_prompt(prompt_b, test_input, model, temperature=0.3)
+    # A and B are independent, so run them concurrently
+    result_a, result_b = execute_prompt_batch([
+        {'system_prompt': prompt_a, 'user_prompt': test_input, 'model': model, 'temperature': 0.3},
+        {'system_prompt': prompt_b, 'user_prompt': test_input, 'model': model, 'temperature': 0.3},
+    ])
 
     judge_system = ADVANCED_PROMPTS['ab_judge']
     judge_input = (
@@ -919,87 +1518,75 @@ def compare_prompt_outputs(prompt_a, prompt_b, test_input, model='gpt-4o-mini'):
     )
     judge_result = execute_prompt(judge_system, judge_input, model, temperature=0.1)
 
-    total_tokens = (
-        result_a.get('tokens_input', 0) + result_a.get('tokens_output', 0) +
-        result_b.get('tokens_input', 0) + result_b.get('tokens_output', 0) +
-        judge_result.get('tokens_input', 0) + judge_result.get('tokens_output', 0)
-    )
-    total_cost = (
-        result_a.get('cost_estimate', 0) + result_b.get('cost_estimate', 0) +
-        judge_result.get('cost_estimate', 0)
+    usage = Usage()
+    usage.add_concurrent([result_a, result_b])
+    usage.add(judge_result)
+
+    return usage.as_result(
+        judge_result.get('output', ''), model,
+        output_a=result_a.get('output', ''), output_b=result_b.get('output', ''),
     )
 
-    return {
-        'output': judge_result.get('output', ''),
-        'output_a': result_a.get('output', ''),
-        'output_b': result_b.get('output', ''),
-        'tokens_input': total_tokens,
-        'tokens_output': 0,
-        'cost_estimate': total_cost,
-        'latency_ms': (
-            result_a.get('latency_ms', 0) + result_b.get('latency_ms', 0) +
-            judge_result.get('latency_ms', 0)
-        ),
-        'model': model,
-    }
+
+def _validate_json_output(output):
+    """Return (True, None) if output contains a parseable JSON object/array, else (False, error)."""
+    span = _json_span(_sanitize_json(output))
+    if span is None:
+        return False, "No JSON object or array found in the output"
+    try:
+        orjson.loads(span)
+    except orjson.JSONDecodeError as e:
+        return False, str(e)
+    return True, None
+
+
+@functools.lru_cache(maxsize=256)
+def _schema_system(schema_text):
+    """Schema-enforcer system prompt for one schema; the same schema is usually enforced repeatedly."""
+    return ADVANCED_PROMPTS['schema_enforcer'] + f"\n\nRequired JSON Schema:\n{schema_text}"
 
 
 def enforce_schema(prompt_text, schema_text, input_text, model='gpt-4o-mini', max_retries=3):
     """Execute a prompt with JSON schema enforcement and auto-retry on validation failure."""
-    system = (
-        ADVANCED_PROMPTS['schema_enforcer'] +
-        f"\n\nRequired JSON Schema:\n{schema_text}"
-    )
+    system = _schema_system(schema_text)
+    user = f"{prompt_text}\n\nInput:\n{input_text}"
     best_output = None
     all_attempts = []
+    usage = Usage()
+    valid = False
+    validation_errors = None
 
     for attempt in range(max_retries):
         if attempt == 0:
-            user = f"{prompt_text}\n\nInput:\n{input_text}"
+            attempt_user = user
         else:
-            user = (
-                f"{prompt_text}\n\nInput:\n{input_text}\n\n"
+            attempt_user = (
+                f"{user}\n\n"
                 f"IMPORTANT: Your previous attempt was invalid. Errors:\n{validation_errors}\n"
                 f"Fix these errors and return ONLY valid JSON matching the schema."
             )
-
-        result = execute_prompt(system, user, model, temperature=0.1, max_tokens=2048)
+        result = execute_prompt(system, attempt_user, model, temperature=0.1, max_tokens=2048)
         output = result.get('output', '')
-
-        # Try to validate against schema
-        try:
-            sanitized = _sanitize_json(output)
-            start = sanitized.find('{')
-            end = sanitized.rfind('}')
-            if start < 0:
-                start = sanitized.find('[')
-                end = sanitized.rfind(']')
-            if start >= 0 and end > start:
-                parsed = json.loads(sanitized[start:end + 1])
-                all_attempts.append({'attempt': attempt + 1, 'valid': True, 'output': output})
-                best_output = output
-                break
-        except json.JSONDecodeError as e:
-            validation_errors = str(e)
-            all_attempts.append({'attempt': attempt + 1, 'valid': False, 'error': validation_errors})
+        usage.add(result)
+        valid, validation_errors = _validate_json_output(output)
+        # The valid output is already returned as 'result', so attempts only log outcomes
+        entry = {'attempt': attempt + 1, 'valid': valid}
+        if not valid:
+            entry['error'] = validation_errors
+        all_attempts.append(entry)
+        if valid or best_output is None:
             best_output = output
+        if valid:
+            break
 
-    attempts_summary = json.dumps(all_attempts, indent=2)
-    final_output = json.dumps({
+    final_output = _json_pretty({
         'result': best_output,
         'attempts': all_attempts,
         'total_attempts': len(all_attempts),
-        'success': all_attempts[-1]['valid'] if all_attempts else False,
-    }, indent=2)
+        'success': valid,
+    })
 
-    return {
-        'output': final_output,
-        'tokens_input': result.get('tokens_input', 0),
-        'tokens_output': result.get('tokens_output', 0),
-        'cost_estimate': result.get('cost_estimate', 0),
-        'latency_ms': result.get('latency_ms', 0),
-        'model': model,
-    }
+    return usage.as_result(final_output, model)
 
 
 # --- Phase 2: Advanced Patterns ---
@@ -1008,92 +1595,81 @@ def execute_self_correcting(prompt_text, input_text, criteria='',
                             max_rounds=3, threshold=7, model='gpt-4o-mini'):
     """Generate, critique, and revise in a loop until quality threshold is met."""
     rounds = []
-    total_tokens = 0
-    total_cost = 0.0
-    total_latency = 0
+    usage = Usage()
 
     # Round 1: Generate initial response
     gen_result = execute_prompt(prompt_text, input_text, model, temperature=0.5, max_tokens=2048)
     current_output = gen_result.get('output', '')
-    total_tokens += gen_result.get('tokens_input', 0) + gen_result.get('tokens_output', 0)
-    total_cost += gen_result.get('cost_estimate', 0)
-    total_latency += gen_result.get('latency_ms', 0)
+    usage.add(gen_result)
 
     rounds.append({
         'round': 1, 'type': 'generation', 'output': current_output,
     })
 
     for i in range(max_rounds):
-        # Critique
-        critic_system = ADVANCED_PROMPTS['self_correct_critic']
         critic_input = f"Task: {prompt_text}\n\nResponse to evaluate:\n---\n{current_output}\n---"
         if criteria:
             critic_input += f"\n\nAdditional quality criteria:\n{criteria}"
 
-        critic_result = execute_prompt(critic_system, critic_input, model, temperature=0.1, max_tokens=1024)
-        critique = critic_result.get('output', '')
-        total_tokens += critic_result.get('tokens_input', 0) + critic_result.get('tokens_output', 0)
-        total_cost += critic_result.get('cost_estimate', 0)
-        total_latency += critic_result.get('latency_ms', 0)
+        # Critique and revise in one call; revise separately only if that reply is unusable
+        combined_result = execute_prompt(
+            ADVANCED_PROMPTS['self_correct_combined'], critic_input, model, temperature=0.1, max_tokens=3072
+        )
+        usage.add(combined_result)
+        critique = combined_result.get('output', '')
+        revised = None
+        passes = False
+        try:
+            parsed = json.loads(_sanitize_json(critique))
+            if isinstance(parsed, dict):
+                passes = bool(parsed.get('passes_threshold', False))
+                revised = parsed.pop('revised_output', None)
+                critique = _json_pretty(parsed)
+        except (json.JSONDecodeError, TypeError):
+            pass
 
         rounds.append({
             'round': i + 1, 'type': 'critique', 'output': critique,
         })
 
-        # Check if passes threshold
-        try:
-            parsed = json.loads(_sanitize_json(critique))
-            if isinstance(parsed, dict) and parsed.get('passes_threshold', False):
-                break
-        except (json.JSONDecodeError, TypeError):
-            pass
+        if passes:
+            break
 
-        # Revise
-        reviser_system = ADVANCED_PROMPTS['self_correct_reviser']
-        reviser_input = (
-            f"Original task: {prompt_text}\n\n"
-            f"Current response:\n---\n{current_output}\n---\n\n"
-            f"Critic's feedback:\n---\n{critique}\n---"
-        )
-        revise_result = execute_prompt(reviser_system, reviser_input, model, temperature=0.3, max_tokens=2048)
-        current_output = revise_result.get('output', '')
-        total_tokens += revise_result.get('tokens_input', 0) + revise_result.get('tokens_output', 0)
-        total_cost += revise_result.get('cost_estimate', 0)
-        total_latency += revise_result.get('latency_ms', 0)
+        if not (isinstance(revised, str) and revised.strip()):
+            reviser_input = (
+                f"Original task: {prompt_text}\n\n"
+                f"Current response:\n---\n{current_output}\n---\n\n"
+                f"Critic's feedback:\n---\n{critique}\n---"
+            )
+            revise_result = execute_prompt(
+                ADVANCED_PROMPTS['self_correct_reviser'], reviser_input, model, temperature=0.3, max_tokens=2048
+            )
+            revised = revise_result.get('output', '')
+            usage.add(revise_result)
+        current_output = revised
 
         rounds.append({
             'round': i + 1, 'type': 'revision', 'output': current_output,
         })
 
-    final_output = json.dumps({
+    final_output = _json_pretty({
         'final_output': current_output,
         'rounds': rounds,
         'total_rounds': len([r for r in rounds if r['type'] == 'critique']),
-    }, indent=2)
+    })
 
-    return {
-        'output': final_output,
-        'tokens_input': total_tokens,
-        'tokens_output': 0,
-        'cost_estimate': total_cost,
-        'latency_ms': total_latency,
-        'model': model,
-    }
+    return usage.as_result(final_output, model)
 
 
 def execute_quality_pipeline(task_prompt, input_text, model='gpt-4o-mini'):
     """Multi-stage quality gate pipeline: generate -> check -> revise -> validate."""
     stages = []
-    total_tokens = 0
-    total_cost = 0.0
-    total_latency = 0
+    usage = Usage()
 
     # Stage 1: Generate
     gen_result = execute_prompt(task_prompt, input_text, model, temperature=0.5, max_tokens=2048)
     content = gen_result.get('output', '')
-    total_tokens += gen_result.get('tokens_input', 0) + gen_result.get('tokens_output', 0)
-    total_cost += gen_result.get('cost_estimate', 0)
-    total_latency += gen_result.get('latency_ms', 0)
+    usage.add(gen_result)
     stages.append({'stage': 'Generator', 'status': 'completed', 'output': content})
 
     # Stage 2: Safety & Quality Check
@@ -1103,9 +1679,7 @@ def execute_quality_pipeline(task_prompt, input_text, model='gpt-4o-mini'):
         model, temperature=0.1, max_tokens=1024
     )
     check_output = check_result.get('output', '')
-    total_tokens += check_result.get('tokens_input', 0) + check_result.get('tokens_output', 0)
-    total_cost += check_result.get('cost_estimate', 0)
-    total_latency += check_result.get('latency_ms', 0)
+    usage.add(check_result)
 
     passed = True
     try:
@@ -1120,55 +1694,76 @@ def execute_quality_pipeline(task_prompt, input_text, model='gpt-4o-mini'):
         'output': check_output,
     })
 
-    # Stage 3: Revise if needed
+    # Stage 3: Revise if needed, with the reviser assessing its own revision
     if not passed:
-        revise_system = ADVANCED_PROMPTS['quality_gate_reviser'].format(issues=check_output)
+        revise_system = render_prompt(ADVANCED_PROMPTS['quality_gate_reviser_validated'], issues=check_output)
         revise_result = execute_prompt(
-            revise_system, content, model, temperature=0.3, max_tokens=2048
+            revise_system, content, model, temperature=0.3, max_tokens=3072
         )
-        content = revise_result.get('output', '')
-        total_tokens += revise_result.get('tokens_input', 0) + revise_result.get('tokens_output', 0)
-        total_cost += revise_result.get('cost_estimate', 0)
-        total_latency += revise_result.get('latency_ms', 0)
+        usage.add(revise_result)
+        revised, validation = revise_result.get('output', ''), None
+        try:
+            parsed = json.loads(_sanitize_json(revised))
+            if isinstance(parsed, dict) and isinstance(parsed.get('revised_content'), str):
+                revised, validation = parsed['revised_content'], parsed.get('validation')
+        except (json.JSONDecodeError, TypeError):
+            pass
+        content = revised
         stages.append({'stage': 'Reviser', 'status': 'completed', 'output': content})
 
-        # Stage 4: Re-validate
-        recheck_result = execute_prompt(
-            ADVANCED_PROMPTS['quality_gate_safety'],
-            f"Content to review:\n---\n{content}\n---\n\nOriginal task: {task_prompt}",
-            model, temperature=0.1, max_tokens=1024
-        )
-        recheck_output = recheck_result.get('output', '')
-        total_tokens += recheck_result.get('tokens_input', 0) + recheck_result.get('tokens_output', 0)
-        total_cost += recheck_result.get('cost_estimate', 0)
-        total_latency += recheck_result.get('latency_ms', 0)
+        # Stage 4: Re-validate, in a separate call only if the reviser gave no usable assessment
+        if isinstance(validation, dict):
+            recheck_output = _json_pretty(validation)
+        else:
+            recheck_result = execute_prompt(
+                ADVANCED_PROMPTS['quality_gate_safety'],
+                f"Content to review:\n---\n{content}\n---\n\nOriginal task: {task_prompt}",
+                model, temperature=0.1, max_tokens=1024
+            )
+            recheck_output = recheck_result.get('output', '')
+            usage.add(recheck_result)
         stages.append({'stage': 'Final Validation', 'status': 'completed', 'output': recheck_output})
     else:
         stages.append({'stage': 'Reviser', 'status': 'skipped', 'output': 'Not needed - all checks passed'})
         stages.append({'stage': 'Final Validation', 'status': 'skipped', 'output': 'Not needed'})
 
-    final_output = json.dumps({
+    final_output = _json_pretty({
         'final_content': content,
         'stages': stages,
         'all_passed': passed,
-    }, indent=2)
+    })
 
-    return {
-        'output': final_output,
-        'tokens_input': total_tokens,
-        'tokens_output': 0,
-        'cost_estimate': total_cost,
-        'latency_ms': total_latency,
-        'model': model,
-    }
+    return usage.as_result(final_output, model)
+
+
+def _dependency_graph(sub_tasks):
+    """Dependency indexes for each sub-task.
+
+    Dependencies may only point at earlier steps; a plan without list-valued
+    depends_on falls back to the old chain where each step sees the previous one.
+    """
+    index_of = {}
+    graph = []
+    for i, task in enumerate(sub_tasks):
+        depends_on = task.get('depends_on')
+        if isinstance(depends_on, list):
+            graph.append(sorted({index_of[d] for d in depends_on if d in index_of}))
+        else:
+            graph.append([i - 1] if i else [])
+        index_of.setdefault(task.get('step', i + 1), i)
+    return graph
+
+
+def _dependency_context(deps, results):
+    if not deps:
+        return ''
+    return "\n\nContext from previous steps:\n" + "\n\n".join(results[d].get('output', '')[:500] for d in deps)
 
 
 def execute_decomposition(task_description, model='gpt-4o-mini'):
     """Break a complex task into sub-tasks, execute each, and integrate results."""
     stages = []
-    total_tokens = 0
-    total_cost = 0.0
-    total_latency = 0
+    usage = Usage()
 
     # Stage 1: Plan
     plan_result = execute_prompt(
@@ -1176,9 +1771,7 @@ def execute_decomposition(task_description, model='gpt-4o-mini'):
         model, temperature=0.2, max_tokens=2048
     )
     plan_output = plan_result.get('output', '')
-    total_tokens += plan_result.get('tokens_input', 0) + plan_result.get('tokens_output', 0)
-    total_cost += plan_result.get('cost_estimate', 0)
-    total_latency += plan_result.get('latency_ms', 0)
+    usage.add(plan_result)
     stages.append({'stage': 'Planning', 'output': plan_output})
 
     # Parse sub-tasks
@@ -1190,76 +1783,68 @@ def execute_decomposition(task_description, model='gpt-4o-mini'):
     except (json.JSONDecodeError, TypeError):
         sub_tasks = [{'step': 1, 'title': 'Full Task', 'instruction': task_description}]
 
-    # Stage 2: Execute each sub-task
-    sub_outputs = []
-    for task in sub_tasks:
-        instruction = task.get('instruction', '')
-        context = ''
-        if sub_outputs:
-            context = f"\n\nContext from previous steps:\n{sub_outputs[-1][:500]}"
-
-        sub_result = execute_prompt(
-            "Complete the following sub-task thoroughly and precisely.",
-            f"{instruction}{context}",
-            model, temperature=0.4, max_tokens=1536
-        )
-        sub_output = sub_result.get('output', '')
-        total_tokens += sub_result.get('tokens_input', 0) + sub_result.get('tokens_output', 0)
-        total_cost += sub_result.get('cost_estimate', 0)
-        total_latency += sub_result.get('latency_ms', 0)
-        sub_outputs.append(sub_output)
+    # Stage 2: Execute sub-tasks, each as soon as the steps it depends on are done
+    graph = _dependency_graph(sub_tasks)
+    sub_results, sub_latency = execute_prompt_graph(graph, lambda i, results: {
+        'system_prompt': "Complete the following sub-task thoroughly and precisely.",
+        'user_prompt': f"{sub_tasks[i].get('instruction', '')}{_dependency_context(graph[i], results)}",
+        'model': model, 'temperature': 0.4, 'max_tokens': 1536,
+    })
+    sub_outputs = [r.get('output', '') for r in sub_results]
+    usage.add_concurrent(sub_results, sub_latency)
+    for i, task in enumerate(sub_tasks):
         stages.append({
             'stage': f"Step {task.get('step', '?')}: {task.get('title', '')}",
-            'output': sub_output,
+            'output': sub_outputs[i],
+            'latency_ms': sub_results[i].get('latency_ms', 0),
         })
 
     # Stage 3: Integrate
-    combined = "\n\n---\n\n".join(
+    combined = "\n\n---\n\n".join([
         f"Sub-task {i+1}: {sub_tasks[i].get('title', '')}\n{out}"
         for i, out in enumerate(sub_outputs)
-    )
+    ])
     integrate_result = execute_prompt(
         ADVANCED_PROMPTS['decomposition_integrator'],
         f"Original task: {task_description}\n\nSub-task results:\n{combined}",
         model, temperature=0.3, max_tokens=3072
     )
     integrated = integrate_result.get('output', '')
-    total_tokens += integrate_result.get('tokens_input', 0) + integrate_result.get('tokens_output', 0)
-    total_cost += integrate_result.get('cost_estimate', 0)
-    total_latency += integrate_result.get('latency_ms', 0)
+    usage.add(integrate_result)
     stages.append({'stage': 'Integration', 'output': integrated})
 
-    final_output = json.dumps({
+    final_output = _json_pretty({
         'final_output': integrated,
         'stages': stages,
         'sub_task_count': len(sub_tasks),
-    }, indent=2)
+    })
 
+    return usage.as_result(final_output, model)
+
+
+# --- Phase 3: Security & Templates ---
+
+def _injection_call(system_prompt, model):
     return {
-        'output': final_output,
-        'tokens_input': total_tokens,
-        'tokens_output': 0,
-        'cost_estimate': total_cost,
-        'latency_ms': total_latency,
+        'system_prompt': ADVANCED_PROMPTS['injection_tester'],
+        'user_prompt': f"Analyze this system prompt for vulnerabilities:\n\n---\n{system_prompt}\n---",
         'model': model,
+        'temperature': 0.2,
+        'max_tokens': 3072,
     }
 
 
-# --- Phase 3: Security & Templates ---
-
 def test_prompt_injection(system_prompt, model='gpt-4o-mini'):
     """Analyze a system prompt for injection vulnerabilities."""
-    analyzer_system = ADVANCED_PROMPTS['injection_tester']
-    user_input = f"Analyze this system prompt for vulnerabilities:\n\n---\n{system_prompt}\n---"
-    return execute_prompt(analyzer_system, user_input, model, temperature=0.2, max_tokens=3072)
+    return execute_prompt(**_injection_call(system_prompt, model))
 
 
-def build_fewshot_prompt(task_description, examples_json, model='gpt-4o-mini'):
-    """Build an optimized few-shot prompt from task description and examples."""
+def build_fewshot_prompt(task_description, examples, model='gpt-4o-mini'):
+    """Build an optimized few-shot prompt from task description and a list of input/output pairs."""
     system = ADVANCED_PROMPTS['fewshot_builder']
     user_input = (
         f"Task description: {task_description}\n\n"
-        f"Example input/output pairs:\n{examples_json}"
+        f"Example input/output pairs:\n{orjson.dumps(examples).decode()}"
     )
     return execute_prompt(system, user_input, model, temperature=0.3, max_tokens=3072)
 
@@ -1276,56 +1861,54 @@ EXPERT_PERSONAS = {
 }
 
 
+@functools.lru_cache(maxsize=64)
+def _persona_system(persona_name, persona_description):
+    """Rendered persona system prompt; the built-in personas recur on every panel."""
+    return render_prompt(
+        ADVANCED_PROMPTS['expert_panel_persona'], persona_name=persona_name, persona_description=persona_description
+    )
+
+
 def execute_expert_panel(topic, personas, model='gpt-4o-mini'):
     """Run a multi-persona expert panel discussion with moderator synthesis."""
-    total_tokens = 0
-    total_cost = 0.0
-    total_latency = 0
+    usage = Usage()
     expert_responses = []
 
-    # Round 1: Each expert gives their perspective
-    for persona_key in personas:
-        persona = EXPERT_PERSONAS.get(persona_key, (persona_key, 'domain expert'))
-        system = ADVANCED_PROMPTS['expert_panel_persona'].format(
-            persona_name=persona[0], persona_description=persona[1]
-        )
-        result = execute_prompt(system, f"Topic for discussion:\n{topic}", model, temperature=0.6, max_tokens=1024)
-        total_tokens += result.get('tokens_input', 0) + result.get('tokens_output', 0)
-        total_cost += result.get('cost_estimate', 0)
-        total_latency += result.get('latency_ms', 0)
+    # Round 1: Each expert gives their perspective, all requested at once
+    panel = [EXPERT_PERSONAS.get(persona_key, (persona_key, 'domain expert')) for persona_key in personas]
+    results = execute_prompt_batch([
+        {
+            'system_prompt': _persona_system(*persona),
+            'user_prompt': f"Topic for discussion:\n{topic}",
+            'model': model, 'temperature': 0.6, 'max_tokens': 1024,
+        }
+        for persona in panel
+    ])
+    for persona_key, persona, result in zip(personas, panel, results):
         expert_responses.append({
             'persona': persona[0],
             'persona_key': persona_key,
             'response': result.get('output', ''),
         })
+    # The experts ran concurrently, so the round takes as long as the slowest one
+    usage.add_concurrent(results)
 
     # Round 2: Moderator synthesizes
-    panel_text = "\n\n".join(
-        f"--- {e['persona']} ---\n{e['response']}" for e in expert_responses
-    )
+    panel_text = "\n\n".join([f"--- {e['persona']} ---\n{e['response']}" for e in expert_responses])
     moderator_result = execute_prompt(
         ADVANCED_PROMPTS['expert_panel_moderator'],
         f"Topic: {topic}\n\nExpert perspectives:\n{panel_text}",
         model, temperature=0.2, max_tokens=2048
     )
-    total_tokens += moderator_result.get('tokens_input', 0) + moderator_result.get('tokens_output', 0)
-    total_cost += moderator_result.get('cost_estimate', 0)
-    total_latency += moderator_result.get('latency_ms', 0)
+    usage.add(moderator_result)
 
-    final_output = json.dumps({
+    final_output = _json_pretty({
         'expert_responses': expert_responses,
         'synthesis': moderator_result.get('output', ''),
         'num_experts': len(expert_responses),
-    }, indent=2)
+    })
 
-    return {
-        'output': final_output,
-        'tokens_input': total_tokens,
-        'tokens_output': 0,
-        'cost_estimate': total_cost,
-        'latency_ms': total_latency,
-        'model': model,
-    }
+    return usage.as_result(final_output, model)
 
 
 def execute_document_qa(question, documents, model='gpt-4o-mini'):
@@ -1335,7 +1918,9 @@ def execute_document_qa(question, documents, model='gpt-4o-mini'):
         for i, doc in enumerate(documents)
     )
     system = ADVANCED_PROMPTS['document_qa']
-    user_input = f"Question: {question}\n\nDocuments:\n{doc_text}"
+    # Documents before the question: repeated questions over the same documents then
+    # share a long prompt prefix, which provider-side prompt caching can reuse
+    user_input = f"Documents:\n{doc_text}\n\nQuestion: {question}"
     return execute_prompt(system, user_input, model, temperature=0.1, max_tokens=3072)
 
 
@@ -1365,19 +1950,37 @@ def execute_misconception_detector(topic, student_answer, model='gpt-4o-mini'):
     return execute_prompt(system, user_input, model, temperature=0.2, max_tokens=2048)
 
 
+def _cot_call(question, model):
+    return {
+        'system_prompt': ADVANCED_PROMPTS['cot_visualizer'],
+        'user_prompt': question,
+        'model': model,
+        'temperature': 0.3,
+        'max_tokens': 3072,
+    }
+
+
 def execute_cot_visualizer(question, model='gpt-4o-mini'):
     """Solve a problem with explicit chain-of-thought reasoning steps."""
-    system = ADVANCED_PROMPTS['cot_visualizer']
-    return execute_prompt(system, question, model, temperature=0.3, max_tokens=3072)
+    return execute_prompt(**_cot_call(question, model))
+
+
+def stream_cot_visualizer(question, model='gpt-4o-mini'):
+    """Streaming execute_cot_visualizer that emits each reasoning step as it completes."""
+    return stream_json_items(stream_prompt(**_cot_call(question, model)), 'steps.item')
 
 
 # --- Phase 6: Extended Features ---
 
 def execute_rag_simulator(query, knowledge_chunks, model='gpt-4o-mini'):
     """Simulate a RAG pipeline: retrieve relevant chunks then generate answer."""
-    total_tokens = 0
-    total_cost = 0.0
-    total_latency = 0
+    usage = Usage()
+
+    # The no-context baseline needs nothing from the pipeline, so it runs alongside it
+    baseline = _LLM_EXECUTOR.submit(
+        execute_prompt, "Answer the following question to the best of your knowledge.",
+        query, model, 0.3, 1024
+    )
 
     # Step 1: Retrieve — rank chunks by relevance
     chunks_text = "\n\n".join(
@@ -1388,9 +1991,6 @@ def execute_rag_simulator(query, knowledge_chunks, model='gpt-4o-mini'):
         f"Query: {query}\n\nKnowledge base chunks:\n{chunks_text}",
         model, temperature=0.1, max_tokens=1024
     )
-    total_tokens += retrieval_result.get('tokens_input', 0) + retrieval_result.get('tokens_output', 0)
-    total_cost += retrieval_result.get('cost_estimate', 0)
-    total_latency += retrieval_result.get('latency_ms', 0)
 
     # Parse ranked chunks and select top-K
     retrieval_output = retrieval_result.get('output', '')
@@ -1413,36 +2013,24 @@ def execute_rag_simulator(query, knowledge_chunks, model='gpt-4o-mini'):
         f"Question: {query}\n\nRetrieved context:\n{context}",
         model, temperature=0.3, max_tokens=2048
     )
-    total_tokens += gen_with_context.get('tokens_input', 0) + gen_with_context.get('tokens_output', 0)
-    total_cost += gen_with_context.get('cost_estimate', 0)
-    total_latency += gen_with_context.get('latency_ms', 0)
-
-    # Step 3: Generate without context (baseline)
-    gen_no_context = execute_prompt(
-        "Answer the following question to the best of your knowledge.",
-        query, model, temperature=0.3, max_tokens=1024
-    )
-    total_tokens += gen_no_context.get('tokens_input', 0) + gen_no_context.get('tokens_output', 0)
-    total_cost += gen_no_context.get('cost_estimate', 0)
-    total_latency += gen_no_context.get('latency_ms', 0)
 
-    final_output = json.dumps({
+    # Step 3: Generate without context (baseline), started before retrieval
+    gen_no_context = baseline.result()
+    usage.add_concurrent([retrieval_result, gen_with_context, gen_no_context], latency_ms=max(
+        retrieval_result.get('latency_ms', 0) + gen_with_context.get('latency_ms', 0),
+        gen_no_context.get('latency_ms', 0),
+    ))
+
+    final_output = _json_pretty({
         'retrieval': retrieval_output,
         'selected_chunks': [{'chunk_index': idx, 'text': text[:200] + '...' if len(text) > 200 else text} for idx, text in selected_chunks],
         'answer_with_context': gen_with_context.get('output', ''),
         'answer_without_context': gen_no_context.get('output', ''),
         'num_chunks_total': len(knowledge_chunks),
         'num_chunks_retrieved': len(selected_chunks),
-    }, indent=2)
+    })
 
-    return {
-        'output': final_output,
-        'tokens_input': total_tokens,
-        'tokens_output': 0,
-        'cost_estimate': total_cost,
-        'latency_ms': total_latency,
-        'model': model,
-    }
+    return usage.as_result(final_output, model)
 
 
 def execute_scenario_simulator(plan, stakeholders, model='gpt-4o-mini'):
@@ -1478,21 +2066,34 @@ def execute_self_consistency(question, num_paths=5, model='gpt-4o-mini'):
     return execute_prompt(system, user_input, model, temperature=0.7, max_tokens=4096)
 
 
+def _tree_of_thoughts_call(problem, num_branches=3, max_depth=3, model='gpt-4o-mini'):
+    return {
+        'system_prompt': ADVANCED_PROMPTS['tree_of_thoughts'],
+        'user_prompt': (
+            f"Problem to solve:\n{problem}\n\n"
+            f"Explore {num_branches} initial branches with up to {max_depth} depth levels each."
+        ),
+        'model': model,
+        'temperature': 0.6,
+        'max_tokens': 4096,
+    }
+
+
 def execute_tree_of_thoughts(problem, num_branches=3, max_depth=3, model='gpt-4o-mini'):
     """Explore multiple reasoning branches in a tree structure."""
-    system = ADVANCED_PROMPTS['tree_of_thoughts']
-    user_input = (
-        f"Problem to solve:\n{problem}\n\n"
-        f"Explore {num_branches} initial branches with up to {max_depth} depth levels each."
+    return execute_prompt(**_tree_of_thoughts_call(problem, num_branches, max_depth, model))
+
+
+def stream_tree_of_thoughts(problem, num_branches=3, max_depth=3, model='gpt-4o-mini'):
+    """Streaming execute_tree_of_thoughts that emits each thought node as it completes."""
+    return stream_json_items(
+        stream_prompt(**_tree_of_thoughts_call(problem, num_branches, max_depth, model)), 'thought_tree.item'
     )
-    return execute_prompt(system, user_input, model, temperature=0.6, max_tokens=4096)
 
 
 def execute_reflection_loop(task, input_text, num_rounds=2, model='gpt-4o-mini'):
     """Generate, reflect, and improve through multiple rounds."""
-    total_tokens = 0
-    total_cost = 0.0
-    total_latency = 0
+    usage = Usage()
     rounds = []
 
     system = ADVANCED_PROMPTS['reflection_loop']
@@ -1507,28 +2108,19 @@ def execute_reflection_loop(task, input_text, num_rounds=2, model='gpt-4o-mini')
             )
 
         result = execute_prompt(system, current_task, model, temperature=0.4, max_tokens=3072)
-        total_tokens += result.get('tokens_input', 0) + result.get('tokens_output', 0)
-        total_cost += result.get('cost_estimate', 0)
-        total_latency += result.get('latency_ms', 0)
+        usage.add(result)
         rounds.append({
             'round': i + 1,
             'output': result.get('output', ''),
         })
 
-    final_output = json.dumps({
+    final_output = _json_pretty({
         'rounds': rounds,
         'total_rounds': len(rounds),
         'final_output': rounds[-1].get('output', '') if rounds else '',
-    }, indent=2)
+    })
 
-    return {
-        'output': final_output,
-        'tokens_input': total_tokens,
-        'tokens_output': 0,
-        'cost_estimate': total_cost,
-        'latency_ms': total_latency,
-        'model': model,
-    }
+    return usage.as_result(final_output, model)
 
 
 # --- Phase 14: Agent Patterns ---
@@ -1569,25 +2161,43 @@ def execute_coordinator_router(task, agents=None, model='gpt-4o-mini'):
 
 # --- Phase 15: Auto-Optimization ---
 
-def execute_ape_studio(task_description, examples='', model='gpt-4o-mini'):
-    """Automatically generate and evaluate candidate prompts for a task."""
-    system = ADVANCED_PROMPTS['ape_studio']
+def _ape_call(task_description, examples='', model='gpt-4o-mini'):
     user_input = f"Task description:\n{task_description}"
     if examples:
         user_input += f"\n\nExample inputs/outputs:\n{examples}"
-    return execute_prompt(system, user_input, model, temperature=0.7, max_tokens=4096)
+    return {
+        'system_prompt': ADVANCED_PROMPTS['ape_studio'],
+        'user_prompt': user_input,
+        'model': model,
+        'temperature': 0.7,
+        'max_tokens': 4096,
+    }
 
 
-def execute_prompt_evolution(initial_prompt, feedback='', num_generations=4, model='gpt-4o-mini'):
-    """Evolve a prompt through multiple generations based on feedback."""
-    system = ADVANCED_PROMPTS['prompt_evolution']
+def execute_ape_studio(task_description, examples='', model='gpt-4o-mini'):
+    """Automatically generate and evaluate candidate prompts for a task."""
+    return execute_prompt(**_ape_call(task_description, examples, model))
+
+
+def _evolution_call(initial_prompt, feedback='', num_generations=4, model='gpt-4o-mini'):
     user_input = (
         f"Initial prompt to evolve:\n---\n{initial_prompt}\n---\n\n"
         f"Run {num_generations} generations of evolution."
     )
     if feedback:
         user_input += f"\n\nPerformance feedback on the initial prompt:\n{feedback}"
-    return execute_prompt(system, user_input, model, temperature=0.6, max_tokens=4096)
+    return {
+        'system_prompt': ADVANCED_PROMPTS['prompt_evolution'],
+        'user_prompt': user_input,
+        'model': model,
+        'temperature': 0.6,
+        'max_tokens': 4096,
+    }
+
+
+def execute_prompt_evolution(initial_prompt, feedback='', num_generations=4, model='gpt-4o-mini'):
+    """Evolve a prompt through multiple generations based on feedback."""
+    return execute_prompt(**_evolution_call(initial_prompt, feedback, num_generations, model))
 
 
 def execute_meta_prompt(domain, task_type='', requirements='', model='gpt-4o-mini'):
@@ -1643,39 +2253,129 @@ def execute_memory_aware_prompting(task_description, conversation_type='', conte
     return execute_prompt(system, user_input, model, temperature=0.4, max_tokens=4096)
 
 
+def _json_pretty(data):
+    """Indented JSON text for composed multi-step outputs."""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+# Code fences, capitalized literals and trailing commas, fixed in a single pass
+_SANITIZE_RE = re.compile(r'```(?:json)?\s*\n?|:\s*(NULL|TRUE|FALSE)\b|,\s*([}\]])', re.IGNORECASE)
+
+
+def _sanitize_repl(m):
+    literal, closer = m.group(1, 2)
+    if literal:
+        return ': ' + literal.lower()
+    return closer or ''
+
+
 def _sanitize_json(text):
     """Clean LLM output to extract valid JSON."""
-    cleaned = re.sub(r'```(?:json)?\s*\n?', '', text).strip()
-    cleaned = cleaned.rstrip('`').strip()
-    cleaned = re.sub(r':\s*NULL\b', ': null', cleaned, flags=re.IGNORECASE)
-    cleaned = re.sub(r':\s*TRUE\b', ': true', cleaned, flags=re.IGNORECASE)
-    cleaned = re.sub(r':\s*FALSE\b', ': false', cleaned, flags=re.IGNORECASE)
-    cleaned = re.sub(r',\s*([}\]])', r'\1', cleaned)
-    return cleaned
+    cleaned = text.strip()
+    if cleaned[:1] in ('{', '['):
+        # Already-clean output is by far the common case; skip the rewrite passes
+        try:
+            orjson.loads(cleaned)
+            return cleaned
+        except orjson.JSONDecodeError:
+            pass
+    return _SANITIZE_RE.sub(_sanitize_repl, cleaned).strip().rstrip('`').strip()
 
 
-def generate_meeting_docx(meeting_text):
-    """Convert meeting summary text into a Word document. Returns BytesIO buffer."""
-    from docx import Document
-    from docx.shared import Pt, RGBColor
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
+_JSON_CLOSERS = {'{': '}', '[': ']'}
+
+
+def _json_span(text, openers='{['):
+    """Text from the first opener to the last matching closer, or None if there is none.
+
+    Openers are tried in order, so with the default an object is preferred over
+    an array; text that already is one JSON value is returned without scanning.
+    """
+    first = text[:1]
+    if first and first in openers and text[-1:] == _JSON_CLOSERS[first]:
+        return text
+    for opener in openers:
+        start = text.find(opener)
+        if start >= 0:
+            end = text.rfind(_JSON_CLOSERS[opener])
+            return text[start:end + 1] if end > start else None
+    return None
+
+
+def _add_styled_run(paragraph, text, style):
+    """Add a run carrying a copy of a prebuilt run-properties element (docx or
+    pptx), instead of setting each font property (several XML edits per run)."""
+    run = paragraph.add_run()
+    run.text = text
+    run._r.insert(0, copy.deepcopy(style))
+    return run
 
+
+@functools.lru_cache(maxsize=16)
+def _docx_run_style(rgb_hex, bold=False):
+    """Prebuilt <w:rPr> run properties (colour, weight) for document text."""
+    bold_el = '<w:b/>' if bold else ''
+    return docx_parse_xml(f'<w:rPr {docx_nsdecls("w")}>{bold_el}<w:color w:val="{rgb_hex}"/></w:rPr>')
+
+
+@functools.lru_cache(maxsize=8)
+def _docx_template(title, section=None):
+    """Serialized starting document for the docx exports: styled Normal font,
+    centered title, a spacer paragraph and an optional level-1 section heading.
+
+    Building the styles costs a few hundred lxml operations, so it is done once
+    per title and each export just reopens the bytes.
+    """
     doc = Document()
 
     # Style the default font
-    style = doc.styles['Normal']
-    font = style.font
+    font = doc.styles['Normal'].font
     font.name = 'Calibri'
     font.size = Pt(11)
     font.color.rgb = RGBColor(0x33, 0x33, 0x33)
 
     # Title
-    title = doc.add_heading('Meeting Summary', level=0)
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    for run in title.runs:
+    heading = doc.add_heading(title, level=0)
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for run in heading.runs:
         run.font.color.rgb = RGBColor(0x1A, 0x1A, 0x2E)
 
     doc.add_paragraph('')  # spacer
+    if section:
+        doc.add_heading(section, level=1)
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+# One scan classifies a meeting-summary line as a heading, bullet or key-value pair;
+# alternatives are tried in that order, and lastgroup names the branch that matched
+_MEETING_LINE_RE = re.compile(
+    r'^(?:'
+    r'(?:#{1,3}\s+|\d+\.\s*)(?P<heading_text>.*)'
+    r'|[-*\u2022]\s+(?P<bullet>.*)'
+    r'|(?:\*\*)?(?P<key>[^:*]{2,35})(?:\*\*)?:\s*(?P<value>.*)'
+    r')'
+)
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+
+
+def generate_meeting_docx(meeting_text):
+    """Convert meeting summary text into a Word document. Returns BytesIO buffer."""
+    if Document is None:
+        raise ImportError("python-docx is not installed")
+
+    # Styled title and spacer come from the template
+    doc = Document(io.BytesIO(_docx_template('Meeting Summary')))
+
+    # Styles are resolved once rather than looked up by name for every line
+    styles = doc.styles
+    heading_style = styles['Heading 2']
+    bullet_style, sub_bullet_style = styles['List Bullet'], styles['List Bullet 2']
+    heading_run_style = _docx_run_style('6C6CF4')
+    key_run_style = _docx_run_style('1A1A2E', bold=True)
+    add_paragraph = doc.add_paragraph
 
     # Parse the meeting text into sections
     lines = meeting_text.strip().split('\n')
@@ -1684,42 +2384,31 @@ def generate_meeting_docx(meeting_text):
         if not stripped:
             continue
 
-        # Detect section headers (numbered like "1. Date..." or markdown headings)
-        heading_match = re.match(r'^(?:#{1,3}\s+|(\d+)\.\s*)(.*)', stripped)
-        if heading_match:
-            heading_text = heading_match.group(2) if heading_match.group(2) else heading_match.group(0)
-            is_section = heading_match.group(1) is not None or stripped.startswith('#')
-            if is_section:
-                h = doc.add_heading(heading_text.strip().rstrip(':'), level=2)
-                for run in h.runs:
-                    run.font.color.rgb = RGBColor(0x6C, 0x6C, 0xF4)
-                continue
+        m = _MEETING_LINE_RE.match(stripped)
+        kind = m.lastgroup if m else None
 
-        # Detect bullet points
-        bullet_match = re.match(r'^[-*\u2022]\s+(.*)', stripped)
-        if bullet_match:
-            doc.add_paragraph(bullet_match.group(1), style='List Bullet')
+        # Section headers (numbered like "1. Date..." or markdown headings)
+        if kind == 'heading_text':
+            h = add_paragraph(style=heading_style)
+            heading_text = (m['heading_text'] or m.group(0)).strip().rstrip(':')
+            if heading_text:
+                _add_styled_run(h, heading_text, heading_run_style)
             continue
 
-        # Detect sub-items (indented bullets)
-        sub_match = re.match(r'^\s+[-*\u2022]\s+(.*)', line)
-        if sub_match:
-            doc.add_paragraph(sub_match.group(1), style='List Bullet 2')
+        # Bullet points; indented ones are sub-items
+        if kind == 'bullet':
+            add_paragraph(m['bullet'], style=sub_bullet_style if line[:1].isspace() else bullet_style)
             continue
 
         # Bold key-value pairs like "Date: October 1st" or "**Date**: October 1st"
-        kv_match = re.match(r'^(?:\*\*)?([^:*]{2,35})(?:\*\*)?:\s*(.*)', stripped)
-        if kv_match:
-            p = doc.add_paragraph()
-            run_key = p.add_run(kv_match.group(1).strip() + ': ')
-            run_key.bold = True
-            run_key.font.color.rgb = RGBColor(0x1A, 0x1A, 0x2E)
-            p.add_run(kv_match.group(2).strip())
+        if kind == 'value':
+            p = add_paragraph()
+            _add_styled_run(p, m['key'].strip() + ': ', key_run_style)
+            p.add_run(m['value'].strip())
             continue
 
         # Regular paragraph - strip markdown bold markers
-        clean_text = re.sub(r'\*\*(.+?)\*\*', r'\1', stripped)
-        doc.add_paragraph(clean_text)
+        add_paragraph(_BOLD_RE.sub(r'\1', stripped))
 
     buf = io.BytesIO()
     doc.save(buf)
@@ -1729,47 +2418,27 @@ def generate_meeting_docx(meeting_text):
 
 def generate_quiz_docx(quiz_json_str):
     """Convert quiz JSON into a Word document. Returns BytesIO buffer."""
-    from docx import Document
-    from docx.shared import Pt, RGBColor
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    if Document is None:
+        raise ImportError("python-docx is not installed")
 
     # Parse quiz data
     sanitized = _sanitize_json(quiz_json_str)
-    start = sanitized.find('[')
-    end = sanitized.rfind(']')
-    if start >= 0 and end > start:
-        sanitized = sanitized[start:end + 1]
-    questions = json.loads(sanitized)
-    if not isinstance(questions, list):
-        questions = [questions]
-
-    doc = Document()
-
-    # Style
-    style = doc.styles['Normal']
-    font = style.font
-    font.name = 'Calibri'
-    font.size = Pt(11)
-    font.color.rgb = RGBColor(0x33, 0x33, 0x33)
-
-    # Title
-    title = doc.add_heading('Training Quiz', level=0)
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    for run in title.runs:
-        run.font.color.rgb = RGBColor(0x1A, 0x1A, 0x2E)
+    sanitized = _json_span(sanitized, '[') or sanitized
+    doc = Document(io.BytesIO(_docx_template('Training Quiz', 'Questions')))
 
-    doc.add_paragraph(f'Total Questions: {len(questions)}')
-    doc.add_paragraph('')
+    # Filled in once the questions have been streamed through; sits above the spacer
+    total_paragraph = doc.paragraphs[1].insert_paragraph_before()
 
-    # Questions section
-    doc.add_heading('Questions', level=1)
-
-    for i, q in enumerate(questions, 1):
+    # Only the answers are kept for the answer key, not the parsed questions
+    answers = []
+    add_paragraph = doc.add_paragraph
+    for i, q in enumerate(_iter_json_array(sanitized), 1):
+        answers.append(q.get('correct_answer', 'N/A'))
         question_text = q.get('question', f'Question {i}')
         difficulty = q.get('difficulty', '')
 
         # Question heading
-        p = doc.add_paragraph()
+        p = add_paragraph()
         run_num = p.add_run(f'Q{i}. ')
         run_num.bold = True
         run_num.font.size = Pt(12)
@@ -1786,20 +2455,21 @@ def generate_quiz_docx(quiz_json_str):
         options = q.get('options', [])
         for j, opt in enumerate(options):
             letter = chr(65 + j)
-            p = doc.add_paragraph()
+            p = add_paragraph()
             p.paragraph_format.left_indent = Pt(24)
             run = p.add_run(f'{letter}) {opt}')
             run.font.size = Pt(11)
 
-        doc.add_paragraph('')
+        add_paragraph('')
 
     # Answer key on new page
     doc.add_page_break()
     doc.add_heading('Answer Key', level=1)
 
-    for i, q in enumerate(questions, 1):
-        correct = q.get('correct_answer', 'N/A')
-        p = doc.add_paragraph()
+    total_paragraph.text = f'Total Questions: {len(answers)}'
+
+    for i, correct in enumerate(answers, 1):
+        p = add_paragraph()
         run_num = p.add_run(f'Q{i}: ')
         run_num.bold = True
         run_ans = p.add_run(str(correct))
@@ -1812,97 +2482,112 @@ def generate_quiz_docx(quiz_json_str):
     return buf
 
 
+# Below this size a whole-document orjson parse is several times faster than
+# streaming and the parsed array is small; above it, items are streamed
+_STREAM_PARSE_MIN_CHARS = 1 << 20
+
+
+def _iter_json_array(text):
+    """Yield the elements of a JSON array (a lone object yields itself); very large
+    arrays are streamed so the whole parsed list is never held at once."""
+    if ijson is not None and len(text) >= _STREAM_PARSE_MIN_CHARS and text.lstrip().startswith('['):
+        yield from ijson.items(io.BytesIO(text.encode()), 'item', use_float=True)
+        return
+    data = orjson.loads(text)
+    yield from (data if isinstance(data, list) else [data])
+
+
 def _sanitize_slide_json(text):
     """Clean LLM output to extract valid JSON for slide data."""
     cleaned = _sanitize_json(text)
     # Find the JSON array
-    start = cleaned.find('[')
-    end = cleaned.rfind(']')
-    if start >= 0 and end > start:
-        cleaned = cleaned[start:end + 1]
-    return cleaned
+    return _json_span(cleaned, '[') or cleaned
+
+
+@functools.lru_cache(maxsize=16)
+def _pptx_run_style(size_pt, rgb_hex, bold=False):
+    """Prebuilt <a:rPr> run properties (size, colour, weight) for slide text."""
+    bold_attr = ' b="1"' if bold else ''
+    return parse_xml(
+        f'<a:rPr {nsdecls("a")} sz="{size_pt * 100}"{bold_attr}>'
+        f'<a:solidFill><a:srgbClr val="{rgb_hex}"/></a:solidFill></a:rPr>'
+    )
 
 
 def generate_pptx(slide_json_str):
     """Convert slide script JSON into a PowerPoint file. Returns BytesIO buffer."""
-    from pptx import Presentation
-    from pptx.util import Inches, Pt, Emu
-    from pptx.dml.color import RGBColor
-    from pptx.enum.text import PP_ALIGN
+    if Presentation is None:
+        raise ImportError("python-pptx is not installed")
 
     # Parse the slide data
     sanitized = _sanitize_slide_json(slide_json_str)
-    slides_data = json.loads(sanitized)
-    if not isinstance(slides_data, list):
-        slides_data = [slides_data]
 
     prs = Presentation()
     # Set 16:9 aspect ratio
     prs.slide_width = Inches(13.333)
     prs.slide_height = Inches(7.5)
 
-    for slide_data in slides_data:
-        slide_layout = prs.slide_layouts[6]  # blank layout
-        slide = prs.slides.add_slide(slide_layout)
+    # Layout, geometry and colours are the same on every slide
+    slide_layout = prs.slide_layouts[6]  # blank layout
+    bg_rgb = PptxRGBColor(0x1E, 0x1E, 0x2E)
+    accent_rgb = PptxRGBColor(0x6C, 0x6C, 0xF4)
+    num_style = _pptx_run_style(14, '9494F8', bold=True)
+    title_style = _pptx_run_style(32, 'CDD6F4', bold=True)
+    bullet_style = _pptx_run_style(18, 'BAC2DE')
+    num_box_geometry = (Inches(11.5), Inches(0.3), Inches(1.2), Inches(0.5))
+    title_box_geometry = (Inches(0.8), Inches(0.6), Inches(10), Inches(1.2))
+    accent_geometry = (Inches(0.8), Inches(1.85), Inches(3), Emu(36000))
+    bullet_box_geometry = (Inches(0.8), Inches(2.2), Inches(11), Inches(4))
+    bullet_spacing = PptxPt(12)
+
+    add_slide = prs.slides.add_slide
+    for slide_data in _iter_json_array(sanitized):
+        slide = add_slide(slide_layout)
+        shapes = slide.shapes
 
         # Background fill
-        bg = slide.background
-        fill = bg.fill
+        fill = slide.background.fill
         fill.solid()
-        fill.fore_color.rgb = RGBColor(0x1E, 0x1E, 0x2E)
+        fill.fore_color.rgb = bg_rgb
 
         # Slide number badge (top-right)
         slide_num = slide_data.get('slide_number', '')
         if slide_num:
-            num_box = slide.shapes.add_textbox(Inches(11.5), Inches(0.3), Inches(1.2), Inches(0.5))
+            num_box = shapes.add_textbox(*num_box_geometry)
             tf = num_box.text_frame
             tf.word_wrap = True
             p = tf.paragraphs[0]
             p.alignment = PP_ALIGN.CENTER
-            run = p.add_run()
-            run.text = f"#{slide_num}"
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(0x94, 0x94, 0xF8)
-            run.font.bold = True
+            _add_styled_run(p, f"#{slide_num}", num_style)
 
         # Title
         title_text = slide_data.get('title', 'Untitled')
-        title_box = slide.shapes.add_textbox(Inches(0.8), Inches(0.6), Inches(10), Inches(1.2))
+        title_box = shapes.add_textbox(*title_box_geometry)
         tf = title_box.text_frame
         tf.word_wrap = True
-        p = tf.paragraphs[0]
-        run = p.add_run()
-        run.text = title_text
-        run.font.size = Pt(32)
-        run.font.bold = True
-        run.font.color.rgb = RGBColor(0xCD, 0xD6, 0xF4)
+        _add_styled_run(tf.paragraphs[0], title_text, title_style)
 
         # Accent line under title
-        slide.shapes.add_shape(
-            1, Inches(0.8), Inches(1.85), Inches(3), Emu(36000)
-        ).fill.solid()
-        slide.shapes[-1].fill.fore_color.rgb = RGBColor(0x6C, 0x6C, 0xF4)
+        accent = shapes.add_shape(1, *accent_geometry)
+        accent.fill.solid()
+        accent.fill.fore_color.rgb = accent_rgb
 
         # Bullet points
         bullets = slide_data.get('bullets', [])
         if bullets:
-            bullet_box = slide.shapes.add_textbox(Inches(0.8), Inches(2.2), Inches(11), Inches(4))
+            bullet_box = shapes.add_textbox(*bullet_box_geometry)
             tf = bullet_box.text_frame
             tf.word_wrap = True
+            add_paragraph = tf.add_paragraph
             for i, bullet in enumerate(bullets):
-                p = tf.paragraphs[0] if i == 0 else tf.add_paragraph()
-                p.space_after = Pt(12)
-                run = p.add_run()
-                run.text = f"\u2022  {bullet}"
-                run.font.size = Pt(18)
-                run.font.color.rgb = RGBColor(0xBA, 0xC2, 0xDE)
+                p = tf.paragraphs[0] if i == 0 else add_paragraph()
+                p.space_after = bullet_spacing
+                _add_styled_run(p, f"\u2022  {bullet}", bullet_style)
 
         # Speaker notes
         notes_text = slide_data.get('speaker_notes', '')
         if notes_text:
-            notes_slide = slide.notes_slide
-            notes_tf = notes_slide.notes_text_frame
-            notes_tf.text = notes_text
+            slide.notes_slide.notes_text_frame.text = notes_text
 
     buf = io.BytesIO()
     prs.save(buf)
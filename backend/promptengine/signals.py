@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PromptExecution, PromptTemplate, PromptVersion
+from .pagination import bump_execution_count_version, bump_template_list_version
+
+
+@receiver([post_save, post_delete], sender=PromptExecution)
+def invalidate_execution_counts(sender, **kwargs):
+    bump_execution_count_version()
+
+
+@receiver([post_save, post_delete], sender=PromptTemplate)
+@receiver([post_save, post_delete], sender=PromptVersion)
+def invalidate_template_lists(sender, **kwargs):
+    bump_template_list_version()
@@ -14,10 +14,14 @@ urlpatterns = [
     # Feature endpoints
     path('execute/feedback-analysis/', views.feedback_analysis, name='feedback-analysis'),
     path('execute/meeting-summarizer/', views.meeting_summarizer, name='meeting-summarizer'),
+    path('execute/meeting-summarizer/stream/', views.meeting_summarizer_stream, name='meeting-summarizer-stream'),
     path('execute/quiz-generator/', views.quiz_generator, name='quiz-generator'),
+    path('execute/quiz-generator/stream/', views.quiz_generator_stream, name='quiz-generator-stream'),
     path('execute/slide-script/', views.slide_script_generator, name='slide-script'),
+    path('execute/slide-script/stream/', views.slide_script_generator_stream, name='slide-script-stream'),
     path('execute/complaint-response/', views.complaint_response, name='complaint-response'),
     path('execute/custom/', views.custom_prompt, name='custom-prompt'),
+    path('execute/custom/stream/', views.custom_prompt_stream, name='custom-prompt-stream'),
     # Export endpoints
     path('export/slides-pptx/', views.export_slides_pptx, name='export-slides-pptx'),
     path('export/meeting-docx/', views.export_meeting_docx, name='export-meeting-docx'),
@@ -40,6 +44,7 @@ urlpatterns = [
     path('execute/tone-transformer/', views.tone_transformer, name='tone-transformer'),
     path('execute/misconception-detector/', views.misconception_detector, name='misconception-detector'),
     path('execute/cot-visualizer/', views.cot_visualizer, name='cot-visualizer'),
+    path('execute/cot-visualizer/stream/', views.cot_visualizer_stream, name='cot-visualizer-stream'),
     # Phase 6: Extended Features
     path('execute/rag-simulator/', views.rag_simulator, name='rag-simulator'),
     path('execute/scenario-simulator/', views.scenario_simulator, name='scenario-simulator'),
@@ -47,6 +52,7 @@ urlpatterns = [
     # Phase 13: Advanced Reasoning
     path('execute/self-consistency/', views.self_consistency, name='self-consistency'),
     path('execute/tree-of-thoughts/', views.tree_of_thoughts, name='tree-of-thoughts'),
+    path('execute/tree-of-thoughts/stream/', views.tree_of_thoughts_stream, name='tree-of-thoughts-stream'),
     path('execute/reflection-loop/', views.reflection_loop, name='reflection-loop'),
     # Phase 14: Agent Patterns
     path('execute/react-agent/', views.react_agent, name='react-agent'),
@@ -63,4 +69,8 @@ urlpatterns = [
     path('execute/context-packer/', views.context_packer, name='context-packer'),
     path('execute/memory-aware/', views.memory_aware, name='memory-aware'),
     path('health/', views.health_check, name='health-check'),
+    path('cache/stats/', views.cache_stats, name='cache-stats'),
+    # Provider batch jobs
+    path('batch-jobs/', views.submit_batch_job, name='submit-batch-job'),
+    path('batch-jobs/<uuid:job_id>/', views.batch_job_detail, name='batch-job-detail'),
 ]
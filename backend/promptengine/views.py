@@ -1,13 +1,21 @@
+import io
+import hashlib
+import uuid
 import logging
-from django.http import FileResponse
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 
-from .models import PromptTemplate, PromptExecution, PromptVersion, PromptChain, SavedOutput
+from .models import PromptTemplate, PromptExecution, PromptVersion, PromptChain, SavedOutput, BatchJob
 from .serializers import (
-    PromptTemplateSerializer, PromptExecutionSerializer,
+    PromptTemplateSerializer, PromptExecutionListSerializer, PromptExecutionDetailSerializer,
     PromptVersionSerializer, PromptChainSerializer, SavedOutputSerializer,
     FeedbackAnalysisRequestSerializer, MeetingSummarizerRequestSerializer,
     QuizGeneratorRequestSerializer, SlideScriptRequestSerializer,
@@ -30,36 +38,70 @@ from .serializers import (
     MetaPromptRequestSerializer, GuardrailBuilderRequestSerializer,
     SelfVerificationRequestSerializer, ContextPackerRequestSerializer,
     MemoryAwareRequestSerializer,
+    BatchJobSerializer, BatchJobRequestSerializer,
 )
-from . import services
+from .cache import response_cache
+from .pagination import CachedCountPagination, cached_template_list
+from . import batch_api, services
 
 logger = logging.getLogger(__name__)
 
+# Seconds a generated export file is kept for repeat downloads
+EXPORT_CACHE_TIMEOUT = 600
+
 
 class PromptTemplateViewSet(viewsets.ModelViewSet):
-    queryset = PromptTemplate.objects.all()
+    # Meta.ordering is not applied to aggregate (GROUP BY) queries, so repeat it
+    queryset = PromptTemplate.objects.annotate(version_count=Count('versions')).order_by('-usage_count', '-created_at')
     serializer_class = PromptTemplateSerializer
     permission_classes = [AllowAny]
     filterset_fields = ['category', 'difficulty', 'is_active', 'is_builtin']
     search_fields = ['name', 'description', 'tags']
     ordering_fields = ['usage_count', 'avg_rating', 'created_at']
 
+    def list(self, request, *args, **kwargs):
+        # Polled by the UI on every page load; pages are cached per URL until a template changes
+        build = super().list
+        return Response(cached_template_list(request, lambda: build(request, *args, **kwargs).data))
+
 
 class PromptExecutionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = PromptExecution.objects.all()
-    serializer_class = PromptExecutionSerializer
+    queryset = PromptExecution.objects.select_related('template')
+    serializer_class = PromptExecutionDetailSerializer
+    pagination_class = CachedCountPagination
     permission_classes = [AllowAny]
     filterset_fields = ['category', 'status', 'model_used']
-    ordering_fields = ['created_at', 'latency_ms', 'cost_estimate']
+    ordering_fields = ['created_at', 'latency_ms', 'cost_micros']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.defer(*PromptExecution.HEAVY_FIELDS)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return PromptExecutionListSerializer
+        return super().get_serializer_class()
 
     @action(detail=True, methods=['post'])
     def rate(self, request, pk=None):
-        execution = self.get_object()
+        # The row is never fetched, so a malformed id would otherwise reach the
+        # UPDATE and fail there instead of returning 404
+        try:
+            pk = uuid.UUID(str(pk))
+        except ValueError:
+            raise Http404
         serializer = RatingSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        execution.rating = serializer.validated_data['rating']
-        execution.feedback = serializer.validated_data.get('feedback', '')
-        execution.save()
+        # A single UPDATE of the two columns; the row is never loaded. Ratings don't
+        # affect the cached list counts, so skipping post_save is intended.
+        updated = PromptExecution.objects.filter(pk=pk).update(
+            rating=serializer.validated_data['rating'],
+            feedback=serializer.validated_data.get('feedback', ''),
+        )
+        if not updated:
+            raise Http404
         return Response({'status': 'rated'})
 
 
@@ -82,44 +124,44 @@ class SavedOutputViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
 
 
-def _execute_feature(request, category, serializer_class, service_fn, extract_args):
-    """Generic helper to execute a feature and store the result."""
-    serializer = serializer_class(data=request.data)
-    serializer.is_valid(raise_exception=True)
-    data = serializer.validated_data
+def _dump(value):
+    """Compact JSON for an execution's input/argument columns, truncated to EXECUTION_LOG_MAX_CHARS."""
+    text = orjson.dumps(value, default=str).decode()
+    limit = settings.EXECUTION_LOG_MAX_CHARS
+    return text if len(text) <= limit else text[:limit] + '...[truncated]'
 
-    args = extract_args(data)
-    result = service_fn(**args)
 
-    # Save execution record
-    execution = PromptExecution.objects.create(
+def _record_execution(request, category, data, args, result, prompts=services.SYSTEM_PROMPTS):
+    """Store a PromptExecution for a finished feature call."""
+    # Count the template use with one UPDATE and link it in the INSERT, without loading it.
+    # The LLM call has already been paid for, so a malformed id just means no template
+    template_id = request.data.get('template_id')
+    try:
+        template_id = uuid.UUID(str(template_id)) if template_id else None
+    except ValueError:
+        template_id = None
+    if template_id and not PromptTemplate.objects.filter(id=template_id).update(usage_count=F('usage_count') + 1):
+        template_id = None
+
+    return PromptExecution.objects.create(
         category=category,
-        input_data=str(data),
-        system_prompt=services.SYSTEM_PROMPTS.get(category, ''),
-        user_prompt=str(args),
+        template_id=template_id,
+        input_data=_dump(data),
+        system_prompt=prompts.get(category, ''),
+        user_prompt=_dump(args),
         output_data=result.get('output', ''),
-        status='completed' if 'error' not in result else 'failed',
+        status=PromptExecution.Status.COMPLETED if 'error' not in result else PromptExecution.Status.FAILED,
         model_used=result.get('model', 'gpt-4o-mini'),
         tokens_input=result.get('tokens_input', 0),
         tokens_output=result.get('tokens_output', 0),
-        cost_estimate=result.get('cost_estimate', 0),
+        cost_micros=round(result.get('cost_estimate', 0) * PromptExecution.MICROS_PER_DOLLAR),
         latency_ms=result.get('latency_ms', 0),
         error_message=result.get('error', ''),
     )
 
-    # Increment template usage if applicable
-    template_id = request.data.get('template_id')
-    if template_id:
-        try:
-            tpl = PromptTemplate.objects.get(id=template_id)
-            tpl.usage_count += 1
-            tpl.save(update_fields=['usage_count'])
-            execution.template = tpl
-            execution.save(update_fields=['template'])
-        except PromptTemplate.DoesNotExist:
-            pass
-
-    return Response({
+
+def _result_payload(execution, result):
+    return {
         'execution_id': str(execution.id),
         'output': result.get('output', ''),
         'error': result.get('error'),
@@ -128,7 +170,57 @@ def _execute_feature(request, category, serializer_class, service_fn, extract_ar
         'cost_estimate': float(result.get('cost_estimate', 0)),
         'latency_ms': result.get('latency_ms', 0),
         'model': result.get('model', 'gpt-4o-mini'),
-    }, status=status.HTTP_200_OK if 'error' not in result else status.HTTP_500_INTERNAL_SERVER_ERROR)
+    }
+
+
+def _execute_feature(request, category, serializer_class, service_fn, extract_args):
+    """Generic helper to execute a feature and store the result."""
+    serializer = serializer_class(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    args = extract_args(data)
+    result = service_fn(**args)
+
+    execution = _record_execution(request, category, data, args, result)
+    return Response(
+        _result_payload(execution, result),
+        status=status.HTTP_200_OK if 'error' not in result else status.HTTP_500_INTERNAL_SERVER_ERROR,
+    )
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+def _stream_feature(request, category, serializer_class, stream_fn, extract_args,
+                    prompts=services.SYSTEM_PROMPTS):
+    """Like _execute_feature, but streams output as server-sent events.
+
+    Emits ``chunk`` events with partial output (and ``item`` events for
+    structured features that parse their JSON incrementally), then one
+    ``done`` (or ``error``) event with the same payload the non-streaming
+    endpoint returns.
+    """
+    serializer = serializer_class(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    args = extract_args(data)
+
+    def events():
+        for kind, value in stream_fn(**args):
+            if kind == 'chunk':
+                yield _sse('chunk', {'content': value})
+            elif kind == 'item':
+                yield _sse('item', value)
+            else:
+                execution = _record_execution(request, category, data, args, value, prompts)
+                yield _sse('done' if 'error' not in value else 'error', _result_payload(execution, value))
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @api_view(['POST'])
@@ -151,6 +243,16 @@ def meeting_summarizer(request):
     )
 
 
+@api_view(['POST'])
+def meeting_summarizer_stream(request):
+    return _stream_feature(
+        request, 'meeting_summarizer',
+        MeetingSummarizerRequestSerializer,
+        services.stream_meeting_summary,
+        lambda d: {'transcript': d['transcript'], 'model': d['model'], 'temperature': d['temperature']}
+    )
+
+
 @api_view(['POST'])
 def quiz_generator(request):
     return _execute_feature(
@@ -164,6 +266,19 @@ def quiz_generator(request):
     )
 
 
+@api_view(['POST'])
+def quiz_generator_stream(request):
+    return _stream_feature(
+        request, 'quiz_generator',
+        QuizGeneratorRequestSerializer,
+        services.stream_quiz,
+        lambda d: {
+            'content': d['content'], 'num_questions': d['num_questions'],
+            'difficulty_mix': d['difficulty_mix'], 'model': d['model'], 'temperature': d['temperature']
+        }
+    )
+
+
 @api_view(['POST'])
 def slide_script_generator(request):
     return _execute_feature(
@@ -177,6 +292,19 @@ def slide_script_generator(request):
     )
 
 
+@api_view(['POST'])
+def slide_script_generator_stream(request):
+    return _stream_feature(
+        request, 'slide_script',
+        SlideScriptRequestSerializer,
+        services.stream_slide_script,
+        lambda d: {
+            'topic': d['topic'], 'num_slides': d['num_slides'],
+            'style': d['style'], 'model': d['model'], 'temperature': d['temperature']
+        }
+    )
+
+
 @api_view(['POST'])
 def complaint_response(request):
     return _execute_feature(
@@ -205,6 +333,50 @@ def custom_prompt(request):
     )
 
 
+@api_view(['POST'])
+def custom_prompt_stream(request):
+    return _stream_feature(
+        request, 'custom',
+        CustomPromptRequestSerializer,
+        services.stream_custom_prompt,
+        lambda d: {
+            'system_prompt': d.get('system_prompt', ''),
+            'user_prompt': d['user_prompt'],
+            'model': d['model'], 'temperature': d['temperature'],
+            'max_tokens': d['max_tokens'],
+        }
+    )
+
+
+def _export_document(generate, source):
+    """Generated document buffer for source text; repeat exports of the same text reuse
+    the bytes built in the last EXPORT_CACHE_TIMEOUT seconds instead of rebuilding them."""
+    if not isinstance(source, str):
+        return generate(source)
+    key = f'promptengine:export:{generate.__name__}:{hashlib.sha256(source.encode()).hexdigest()}'
+    try:
+        data = cache.get(key)
+    except Exception as e:
+        logger.warning("Cached export read failed: %s", e)
+        data = None
+    if data is None:
+        data = generate(source).getvalue()
+        try:
+            cache.set(key, data, EXPORT_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning("Cached export write failed: %s", e)
+    return io.BytesIO(data)
+
+
+def _execution_output(execution_id):
+    """Output of a stored execution, reading only that column; None if it does not exist.
+
+    Raises ValueError, without querying, when execution_id is not a UUID.
+    """
+    execution_id = uuid.UUID(str(execution_id))
+    return PromptExecution.objects.filter(id=execution_id).values_list('output_data', flat=True).first()
+
+
 @api_view(['POST'])
 def export_slides_pptx(request):
     """Export a slide script execution to a PowerPoint file."""
@@ -214,21 +386,22 @@ def export_slides_pptx(request):
     # Get slide JSON from execution record or direct input
     if execution_id:
         try:
-            execution = PromptExecution.objects.get(id=execution_id)
-            slide_json = execution.output_data
-        except PromptExecution.DoesNotExist:
+            slide_json = _execution_output(execution_id)
+        except ValueError:
+            return Response({'error': 'Invalid execution_id'}, status=status.HTTP_400_BAD_REQUEST)
+        if slide_json is None:
             return Response({'error': 'Execution not found'}, status=status.HTTP_404_NOT_FOUND)
 
     if not slide_json:
         return Response({'error': 'No slide data provided'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        buf = services.generate_pptx(slide_json)
+        buf = _export_document(services.generate_pptx, slide_json)
         response = FileResponse(buf, content_type='application/vnd.openxmlformats-officedocument.presentationml.presentation')
         response['Content-Disposition'] = 'attachment; filename="presentation.pptx"'
         return response
     except Exception as e:
-        logger.error(f"PPTX generation failed: {e}")
+        logger.error("PPTX generation failed: %s", e, exc_info=True)
         return Response({'error': f'Failed to generate PowerPoint: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -240,21 +413,22 @@ def export_meeting_docx(request):
 
     if execution_id:
         try:
-            execution = PromptExecution.objects.get(id=execution_id)
-            meeting_text = execution.output_data
-        except PromptExecution.DoesNotExist:
+            meeting_text = _execution_output(execution_id)
+        except ValueError:
+            return Response({'error': 'Invalid execution_id'}, status=status.HTTP_400_BAD_REQUEST)
+        if meeting_text is None:
             return Response({'error': 'Execution not found'}, status=status.HTTP_404_NOT_FOUND)
 
     if not meeting_text:
         return Response({'error': 'No meeting data provided'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        buf = services.generate_meeting_docx(meeting_text)
+        buf = _export_document(services.generate_meeting_docx, meeting_text)
         response = FileResponse(buf, content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
         response['Content-Disposition'] = 'attachment; filename="meeting_summary.docx"'
         return response
     except Exception as e:
-        logger.error(f"Meeting DOCX generation failed: {e}")
+        logger.error("Meeting DOCX generation failed: %s", e, exc_info=True)
         return Response({'error': f'Failed to generate Word document: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -266,21 +440,22 @@ def export_quiz_docx(request):
 
     if execution_id:
         try:
-            execution = PromptExecution.objects.get(id=execution_id)
-            quiz_json = execution.output_data
-        except PromptExecution.DoesNotExist:
+            quiz_json = _execution_output(execution_id)
+        except ValueError:
+            return Response({'error': 'Invalid execution_id'}, status=status.HTTP_400_BAD_REQUEST)
+        if quiz_json is None:
             return Response({'error': 'Execution not found'}, status=status.HTTP_404_NOT_FOUND)
 
     if not quiz_json:
         return Response({'error': 'No quiz data provided'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        buf = services.generate_quiz_docx(quiz_json)
+        buf = _export_document(services.generate_quiz_docx, quiz_json)
         response = FileResponse(buf, content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
         response['Content-Disposition'] = 'attachment; filename="quiz.docx"'
         return response
     except Exception as e:
-        logger.error(f"Quiz DOCX generation failed: {e}")
+        logger.error("Quiz DOCX generation failed: %s", e, exc_info=True)
         return Response({'error': f'Failed to generate Word document: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -295,31 +470,8 @@ def _execute_advanced(request, category, serializer_class, service_fn, extract_a
     args = extract_args(data)
     result = service_fn(**args)
 
-    execution = PromptExecution.objects.create(
-        category=category,
-        input_data=str(data),
-        system_prompt=services.ADVANCED_PROMPTS.get(category, ''),
-        user_prompt=str(args),
-        output_data=result.get('output', ''),
-        status='completed' if 'error' not in result else 'failed',
-        model_used=result.get('model', 'gpt-4o-mini'),
-        tokens_input=result.get('tokens_input', 0),
-        tokens_output=result.get('tokens_output', 0),
-        cost_estimate=result.get('cost_estimate', 0),
-        latency_ms=result.get('latency_ms', 0),
-        error_message=result.get('error', ''),
-    )
-
-    resp = {
-        'execution_id': str(execution.id),
-        'output': result.get('output', ''),
-        'error': result.get('error'),
-        'tokens_input': result.get('tokens_input', 0),
-        'tokens_output': result.get('tokens_output', 0),
-        'cost_estimate': float(result.get('cost_estimate', 0)),
-        'latency_ms': result.get('latency_ms', 0),
-        'model': result.get('model', 'gpt-4o-mini'),
-    }
+    execution = _record_execution(request, category, data, args, result, services.ADVANCED_PROMPTS)
+    resp = _result_payload(execution, result)
     # Include extra fields for multi-output features
     for key in ('output_a', 'output_b'):
         if key in result:
@@ -421,7 +573,7 @@ def fewshot_builder(request):
         request, 'fewshot_builder',
         FewShotBuilderRequestSerializer,
         services.build_fewshot_prompt,
-        lambda d: {'task_description': d['task_description'], 'examples_json': d['examples'], 'model': d['model']}
+        lambda d: {'task_description': d['task_description'], 'examples': d['examples'], 'model': d['model']}
     )
 
 
@@ -489,6 +641,17 @@ def cot_visualizer(request):
     )
 
 
+@api_view(['POST'])
+def cot_visualizer_stream(request):
+    return _stream_feature(
+        request, 'cot_visualizer',
+        CoTVisualizerRequestSerializer,
+        services.stream_cot_visualizer,
+        lambda d: {'question': d['question'], 'model': d['model']},
+        prompts=services.ADVANCED_PROMPTS,
+    )
+
+
 # --- Phase 6: Extended Feature Views ---
 
 @api_view(['POST'])
@@ -546,6 +709,17 @@ def tree_of_thoughts(request):
     )
 
 
+@api_view(['POST'])
+def tree_of_thoughts_stream(request):
+    return _stream_feature(
+        request, 'tree_of_thoughts',
+        TreeOfThoughtsRequestSerializer,
+        services.stream_tree_of_thoughts,
+        lambda d: {'problem': d['problem'], 'num_branches': d['num_branches'], 'max_depth': d['max_depth'], 'model': d['model']},
+        prompts=services.ADVANCED_PROMPTS,
+    )
+
+
 @api_view(['POST'])
 def reflection_loop(request):
     return _execute_advanced(
@@ -667,3 +841,35 @@ def memory_aware(request):
 @api_view(['GET'])
 def health_check(request):
     return Response({'status': 'healthy', 'service': 'prompt-engine-backend'})
+
+
+@api_view(['GET'])
+def cache_stats(request):
+    """Hit/miss counters for this worker's prompt response cache."""
+    return Response(response_cache.get_stats())
+
+
+@api_view(['POST'])
+def submit_batch_job(request):
+    """Queue a bulk feature run on the provider batch endpoint (results within 24h, half price)."""
+    serializer = BatchJobRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    try:
+        job = batch_api.submit_feature_batch(data['feature'], data['inputs'], data['model'])
+    except Exception as e:
+        logger.error("Batch submission failed: %s", e)
+        return Response({'error': f'Failed to submit batch job: {str(e)}'}, status=status.HTTP_502_BAD_GATEWAY)
+    return Response(BatchJobSerializer(job).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+def batch_job_detail(request, job_id):
+    """Return a batch job, checking the provider for results while it is still running."""
+    job = get_object_or_404(BatchJob, id=job_id)
+    try:
+        job = batch_api.poll_batch_job(job)
+    except Exception as e:
+        logger.error("Batch polling failed: %s", e)
+        return Response({'error': f'Failed to check batch job: {str(e)}'}, status=status.HTTP_502_BAD_GATEWAY)
+    return Response(BatchJobSerializer(job).data)
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { getExecutions, rateExecution } from '../services/api';
+import { getExecution, getExecutions, rateExecution } from '../services/api';
 import type { PromptExecution } from '../types';
 import { FormattedOutput } from '../components/shared/FormattedOutput';
 
@@ -18,6 +18,14 @@ export const ExecutionHistory: React.FC = () => {
       .finally(() => setLoading(false));
   }, [filterCategory]);
 
+  const handleSelect = (exec: PromptExecution) => {
+    setSelectedExec(exec);
+    // List rows omit the prompt/output text; load the full record for the detail panel.
+    getExecution(exec.id)
+      .then((full) => setSelectedExec((current) => (current?.id === full.id ? full : current)))
+      .catch(() => { /* keep the summary row */ });
+  };
+
   const handleRate = async (id: string, rating: number) => {
     try {
       await rateExecution(id, rating);
@@ -75,7 +83,7 @@ export const ExecutionHistory: React.FC = () => {
               </thead>
               <tbody>
                 {executions.map((exec) => (
-                  <tr key={exec.id} onClick={() => setSelectedExec(exec)} style={{ cursor: 'pointer', background: selectedExec?.id === exec.id ? 'rgba(99,102,241,0.05)' : undefined }}>
+                  <tr key={exec.id} onClick={() => handleSelect(exec)} style={{ cursor: 'pointer', background: selectedExec?.id === exec.id ? 'rgba(99,102,241,0.05)' : undefined }}>
                     <td><span className="badge badge-accent">{categoryLabels[exec.category] || exec.category}</span></td>
                     <td style={{ fontSize: '0.75rem' }}>{exec.model_used}</td>
                     <td><span className={`badge ${exec.status === 'completed' ? 'badge-success' : 'badge-error'}`}>{exec.status}</span></td>
@@ -192,6 +192,9 @@ export const getTemplate = (id: string): Promise<PromptTemplate> =>
 export const getExecutions = (params?: Record<string, string>): Promise<{ results: PromptExecution[] }> =>
   api.get('/api/v1/executions/', { params }).then(r => r.data);
 
+export const getExecution = (id: string): Promise<PromptExecution> =>
+  api.get(`/api/v1/executions/${id}/`).then(r => r.data);
+
 export const rateExecution = (id: string, rating: number, feedback?: string) =>
   api.post(`/api/v1/executions/${id}/rate/`, { rating, feedback }).then(r => r.data);
 
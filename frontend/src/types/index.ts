@@ -46,10 +46,11 @@ export interface PromptExecution {
   template: string | null;
   template_name: string;
   category: string;
-  input_data: string;
-  system_prompt: string;
-  user_prompt: string;
-  output_data: string;
+  // Only present on the detail endpoint; list rows leave the large text out.
+  input_data?: string;
+  system_prompt?: string;
+  user_prompt?: string;
+  output_data?: string;
   status: string;
   model_used: string;
   tokens_input: number;